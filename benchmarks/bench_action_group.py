@@ -0,0 +1,74 @@
+"""Per-invocation overhead of parsing the action-group event and building the
+response: the hand-written envelope code the handlers used to carry versus
+weather_common.action_group.
+
+    python -m benchmarks.bench_action_group -n 100000
+"""
+import argparse
+import json
+
+from benchmarks.harness import action_group_event, report, timed
+from weather_common import action_group
+from weather_common.action_group import ActionGroupRequest
+
+
+def legacy(event):
+    # The envelope code previously duplicated in every handler
+    parameters = event.get('parameters', [])
+    city = None
+    for param in parameters:
+        if param['name'] == 'city':
+            city = param['value']
+            break
+    response_body = {
+        'TEXT': {
+            'body': f"Retrieved coordinates for {city}."
+        }
+    }
+    function_response = {
+        'actionGroup': event['actionGroup'],
+        'function': event['function'],
+        'functionResponse': {
+            'responseState': 'REPROMPT',
+            'responseBody': response_body
+        }
+    }
+    return json.dumps({
+        'messageVersion': '1.0',
+        'response': function_response,
+        'sessionAttributes': event.get('sessionAttributes', {}),
+        'promptSessionAttributes': event.get('promptSessionAttributes', {})
+    })
+
+
+def shared(event):
+    request = ActionGroupRequest.from_event(event)
+    return action_group.dumps(request.reprompt(f"Retrieved coordinates for {request.get('city')}."))
+
+
+def run(fn, event, iterations):
+    samples = []
+    for _ in range(iterations):
+        samples.append(timed(fn, event)[1])
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--iterations', type=int, default=100000)
+    parser.add_argument('--parameters', type=int, default=4,
+                        help='number of parameters in the event')
+    args = parser.parse_args()
+
+    event = action_group_event('geocode_city', session_attributes={'latitude': '47.6', 'longitude': '-122.3'})
+    for i in range(args.parameters - 1):
+        event['parameters'].append({'name': f'extra{i}', 'type': 'string', 'value': str(i)})
+    event['parameters'].append({'name': 'city', 'type': 'string', 'value': 'Seattle'})
+
+    serializer = 'orjson' if action_group.orjson is not None else 'json'
+    for label, fn in (('legacy envelope + json', legacy), (f'action_group + {serializer}', shared)):
+        report(label, run(fn, event, args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Measure gazetteer lookup latency for exact, "City, ST" and prefix queries.
+
+    python -m benchmarks.bench_gazetteer                      # synthetic index
+    python -m benchmarks.bench_gazetteer --index path/to/gazetteer.sqlite
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+
+from benchmarks.harness import report, timed
+from weather_common.gazetteer import Gazetteer, build_index, normalize
+
+SAMPLE_QUERIES = [
+    'Seattle', 'seattle, wa', 'São Paulo', 'Zürich', 'New York City', 'Portland, OR',
+    'Indianapolis', 'Washington, DC', 'Bost', 'nowhereville',
+]
+
+
+SEED_PLACES = [
+    ('Seattle', 'WA', 'US'), ('São Paulo', '27', 'BR'), ('Zürich', 'ZH', 'CH'),
+    ('New York City', 'NY', 'US'), ('Portland', 'OR', 'US'), ('Portland', 'ME', 'US'),
+    ('Indianapolis', 'IN', 'US'), ('Washington', 'DC', 'US'), ('Boston', 'MA', 'US'),
+]
+
+
+def synthetic_records(count, rng):
+    states = ['WA', 'OR', 'CA', 'NY', 'TX', 'DC', 'MA', 'IN']
+    for name, admin1, country in SEED_PLACES:
+        yield (normalize(name), name, admin1, '', country,
+               rng.uniform(25, 49), rng.uniform(-124, -67), rng.randint(1000, 9000000))
+    for _ in range(count):
+        name = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        yield (name, name.title(), rng.choice(states), '', 'US',
+               rng.uniform(25, 49), rng.uniform(-124, -67), rng.randint(1000, 9000000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--index', help='existing gazetteer index to query')
+    parser.add_argument('--rows', type=int, default=30000, help='synthetic index size')
+    parser.add_argument('-n', '--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.index
+        if path is None:
+            path = os.path.join(tmp, 'gazetteer.sqlite')
+            build_index(synthetic_records(args.rows, random.Random(42)), path)
+        gazetteer = Gazetteer(path)
+
+        for query in SAMPLE_QUERIES:
+            samples = []
+            result = None
+            for _ in range(args.iterations // len(SAMPLE_QUERIES)):
+                result, elapsed = timed(gazetteer.lookup, query)
+                samples.append(elapsed)
+            report(repr(query), samples, 'hit' if result else 'miss')
+
+
+if __name__ == '__main__':
+    main()
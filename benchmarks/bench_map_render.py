@@ -0,0 +1,46 @@
+"""Map rendering cost per Streamlit rerun: rebuilding the folium map every time
+versus the memoized render_map in the app.
+
+Most reruns (typing in the sidebar, chat replies) do not change the cities on
+the map; --reruns-per-query sets how many reruns happen between new cities.
+
+    python -m benchmarks.bench_map_render --cities 5 --reruns-per-query 10
+"""
+import argparse
+import logging
+
+from benchmarks.harness import load_streamlit_app, report, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cities', type=int, default=5, help='cities already on the map')
+    parser.add_argument('--reruns-per-query', type=int, default=10)
+    parser.add_argument('-n', '--queries', type=int, default=20)
+    args = parser.parse_args()
+
+    # Outside `streamlit run` every cache call warns about the missing runtime
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    app = load_streamlit_app()
+    weather = 'Sunny, with a high near 64. Northwest wind 5 to 10 mph. ' * 3
+
+    def cities_after(query):
+        # The --cities most recent queries, oldest first
+        first = max(0, query - args.cities + 1)
+        return tuple((f'City {i}', 30.0 + i, -100.0 + i, weather, (60 + i % 10, 'F'))
+                     for i in range(first, query + 1))
+
+    for label, memoized in (('rebuild every rerun', False), ('memoized render_map', True)):
+        app.render_map.clear()
+        samples = []
+        for query in range(args.queries):
+            cities = cities_after(query)
+            for _ in range(args.reruns_per_query):
+                if not memoized:
+                    app.render_map.clear()
+                samples.append(timed(app.render_map, cities)[1])
+        report(label, samples, f'cities={args.cities} reruns/query={args.reruns_per_query}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Compare sequential and concurrent multi-location forecasts in get_weather
+against a local NOAA stand-in with injected latency.
+
+    python -m benchmarks.bench_multi_city --locations 8 --latency 0.05
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import action_group_event, load_lambda, report, timed
+from benchmarks.standins import NoaaHandler, StandInServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--locations', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('-n', '--invocations', type=int, default=10)
+    args = parser.parse_args()
+
+    locations = [{'city': f'City {i}', 'latitude': f'{30 + i}.5', 'longitude': f'-{90 + i}.5'}
+                 for i in range(args.locations)]
+    event = action_group_event('get_weather')
+    event['parameters'] = [{'name': 'locations', 'type': 'string', 'value': json.dumps(locations)}]
+
+    with StandInServer(NoaaHandler, latency=args.latency) as server:
+        handler = load_lambda('get_weather', 'NOAA_API_Weather_Lambda',
+                              env={'NOAA_API_URL': server.base_url})
+        noaa = handler.noaa
+        noaa.http = noaa.make_http_client(ca_certs=server.ca_certs)
+        default_executor = handler.executor
+        for label, pool in (('sequential (1 worker)', ThreadPoolExecutor(max_workers=1)),
+                            (f'concurrent ({handler.MAX_WORKERS} workers)', default_executor)):
+            handler.executor = pool
+            samples = []
+            for _ in range(args.invocations):
+                noaa.points_cache.lru.clear()
+                noaa.forecast_cache.cache.lru.clear()
+                response, elapsed = timed(handler.lambda_handler, dict(event), None)
+                assert 'error' not in response['response']['functionResponse']['responseBody']['TEXT']['body']
+                samples.append(elapsed)
+            report(label, samples, f'locations={args.locations} upstream latency={args.latency * 1000:.0f}ms')
+        handler.executor = default_executor
+
+
+if __name__ == '__main__':
+    main()
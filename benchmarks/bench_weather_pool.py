@@ -0,0 +1,51 @@
+"""Replay get_weather invocations against a local HTTPS stand-in for
+api.weather.gov, with the module-scope shared client and with a fresh
+PoolManager per invocation (the previous behaviour).
+
+    python -m benchmarks.bench_weather_pool -n 200 --latency 0.005
+"""
+import argparse
+
+from benchmarks.harness import action_group_event, load_lambda, report, timed
+from benchmarks.standins import NoaaHandler, StandInServer
+
+
+def run(handler, server, invocations, shared):
+    noaa = handler.noaa
+    event = action_group_event(
+        'get_weather', city='Seattle',
+        # The handler only reuses session coordinates resolved for the same city
+        session_attributes={'city': 'Seattle', 'latitude': '47.6062', 'longitude': '-122.3321'},
+    )
+    noaa.http = noaa.make_http_client(ca_certs=server.ca_certs)
+    server.reset_counters()
+    samples = []
+    for _ in range(invocations):
+        # Measure the network path, not the caches in front of it
+        noaa.points_cache.lru.clear()
+        noaa.forecast_cache.cache.lru.clear()
+        if not shared:
+            noaa.http = noaa.make_http_client(ca_certs=server.ca_certs)
+        response, elapsed = timed(handler.lambda_handler, dict(event), None)
+        assert response['response']['functionResponse']['responseState'] == 'REPROMPT', response
+        samples.append(elapsed)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--invocations', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='server-side latency per request, in seconds')
+    args = parser.parse_args()
+
+    with StandInServer(NoaaHandler, latency=args.latency) as server:
+        handler = load_lambda('get_weather', 'NOAA_API_Weather_Lambda',
+                              env={'NOAA_API_URL': server.base_url})
+        for label, shared in (('fresh client per call', False), ('shared module client', True)):
+            samples = run(handler, server, args.invocations, shared)
+            report(label, samples, f'connections={server.connections} requests={server.requests}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""In-process stand-ins for the AWS clients the Streamlit app calls.
+
+`FakeAgentRuntime` imitates bedrock-agent-runtime's invoke_agent: an event
+stream of orchestration traces (model calls with token usage, an action group
+call that runs a real Lambda handler, the final response) followed by the
+answer in byte chunks. Model latency, chunk pacing and a rate of throttling
+errors are configurable. `LocalLambdaClient` answers lambda.invoke from a
+handler module, as the fast path in the app expects.
+"""
+import io
+import json
+import random
+import re
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+# "... in Seattle?", "... for Portland, OR tomorrow"
+CITY_RE = re.compile(r"\b(?:in|for) ([^\W\d_][\w .,'-]*?)"
+                     r"(?:\s+(?:now|today|tonight|tomorrow|this \w+|next \w+|on \w+))?\s*[?.!]*$",
+                     re.IGNORECASE)
+
+
+class FakeAgentRuntime:
+
+    def __init__(self, action=None, model_latency=0.5, jitter=0.0, chunk_size=16, chunk_interval=0.01,
+                 error_rate=0.0, action_latency=0.0, seed=None):
+        # `action` is a Lambda handler function; it is called with an
+        # action-group event for get_city_weather when the question names a city
+        self.action = action
+        self.model_latency = model_latency
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self.chunk_interval = chunk_interval
+        self.error_rate = error_rate
+        self.action_latency = action_latency
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def _model_delay(self):
+        with self._lock:
+            return self.model_latency + self.jitter * self.random.random()
+
+    def invoke_agent(self, **request):
+        with self._lock:
+            self.calls += 1
+            failed = self.error_rate and self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if failed:
+            raise ClientError({'Error': {'Code': 'throttlingException', 'Message': 'Rate exceeded'}}, 'InvokeAgent')
+        attributes = (request.get('sessionState') or {}).get('sessionAttributes') or {}
+        return {
+            'completion': self._events(request['inputText'], attributes),
+            'sessionId': request['sessionId'],
+            'contentType': 'application/json',
+        }
+
+    def _model_call(self, trace_id, input_tokens, output_tokens):
+        yield orchestration({'modelInvocationInput': {'traceId': trace_id, 'type': 'ORCHESTRATION'}})
+        delay = self._model_delay()
+        time.sleep(delay)
+        yield orchestration({'modelInvocationOutput': {'traceId': trace_id, 'metadata': {
+            'usage': {'inputTokens': input_tokens, 'outputTokens': output_tokens},
+            'totalTimeMs': int(delay * 1000),
+        }}})
+
+    def _events(self, input_text, attributes):
+        match = CITY_RE.search(input_text)
+        city = match.group(1) if match else attributes.get('city')
+        answer = "I can only help with the weather in a particular place."
+        yield from self._model_call('fake-1', 1200, 60)
+        if city and self.action is not None:
+            yield orchestration({'rationale': {'traceId': 'fake-1', 'text': f'Look up the forecast for {city}.'}})
+            yield orchestration({'invocationInput': {'traceId': 'fake-1', 'invocationType': 'ACTION_GROUP',
+                                                     'actionGroupInvocationInput': {
+                                                         'actionGroupName': 'WeatherActionGroup',
+                                                         'function': 'get_city_weather'}}})
+            start = time.perf_counter()
+            if self.action_latency:
+                time.sleep(self.action_latency)
+            response = self.action(action_group_event(city, attributes), None)
+            body = response['response']['functionResponse']['responseBody']['TEXT']['body']
+            yield orchestration({'observation': {'traceId': 'fake-1', 'type': 'ACTION_GROUP',
+                                                 'actionGroupInvocationOutput': {'text': body, 'metadata': {
+                                                     'totalTimeMs': int((time.perf_counter() - start) * 1000)}}}})
+            answer = describe(city, body)
+            yield from self._model_call('fake-2', 2400, 90)
+        yield orchestration({'observation': {'traceId': 'fake-2', 'type': 'FINISH',
+                                             'finalResponse': {'text': answer}}})
+        data = answer.encode('utf-8')
+        for i in range(0, len(data), self.chunk_size):
+            if self.chunk_interval:
+                time.sleep(self.chunk_interval)
+            yield {'chunk': {'bytes': data[i:i + self.chunk_size]}}
+
+
+def orchestration(part):
+    return {'trace': {'agentId': 'FAKEAGENT', 'trace': {'orchestrationTrace': part}}}
+
+
+def action_group_event(city, attributes):
+    return {
+        'messageVersion': '1.0',
+        'actionGroup': 'WeatherActionGroup',
+        'function': 'get_city_weather',
+        'parameters': [{'name': 'city', 'type': 'string', 'value': city}],
+        'sessionAttributes': dict(attributes),
+        'promptSessionAttributes': {},
+    }
+
+
+def describe(city, body):
+    # A sentence or two about the first forecast period, like the agent's answer
+    try:
+        period = json.loads(body)['periods'][0]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return f"I could not get the forecast for {city}: {body}"
+    return (f"{period.get('name') or 'Right now'} in {city}: {period.get('short', 'no summary')}, "
+            f"{period.get('temp')}°{period.get('unit', 'F')}, wind {period.get('wind', 'calm')}. "
+            f"Chance of precipitation {period.get('pop', 0)}%.")
+
+
+class LocalLambdaClient:
+    # lambda.invoke against handler modules, keyed by function name; `latency`
+    # stands in for the invoke round trip
+    def __init__(self, handlers, latency=0.0):
+        self.handlers = handlers
+        self.latency = latency
+
+    def invoke(self, FunctionName, Payload, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        event = json.loads(Payload)
+        try:
+            result = self.handlers[FunctionName].lambda_handler(event, None)
+        except Exception as e:
+            return {'StatusCode': 200, 'FunctionError': 'Unhandled',
+                    'Payload': io.BytesIO(json.dumps({'errorMessage': str(e)}).encode('utf-8'))}
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(result).encode('utf-8'))}
@@ -0,0 +1,77 @@
+"""Helpers shared by the benchmark scripts."""
+import importlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(ROOT, 'lambda_functions')
+LAYER_DIR = os.path.join(LAMBDA_DIR, 'common', 'python')
+STREAMLIT_DIR = os.path.join(ROOT, 'streamlit_app')
+
+# Benchmarks import the shared layer package directly
+if LAYER_DIR not in sys.path:
+    sys.path.insert(0, LAYER_DIR)
+
+
+def load_lambda(directory, module, env=None):
+    # Import a Lambda handler module the way the Lambda runtime would: with its
+    # own directory on sys.path and its configuration in the environment
+    os.environ.update(env or {})
+    # Shared modules read their configuration at import time
+    for name in ('weather_common.noaa', 'weather_common.geocoding'):
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+    path = os.path.join(LAMBDA_DIR, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    if module in sys.modules:
+        handler = importlib.reload(sys.modules[module])
+    else:
+        handler = importlib.import_module(module)
+    if hasattr(handler, 'emit'):
+        # Build the metrics record as usual but keep it out of the report
+        from weather_common import metrics
+        handler.emit = lambda function, values, properties=None: metrics.emf_record(function, values, properties)
+    return handler
+
+
+def load_streamlit_app():
+    # The Streamlit app as a module; main() only runs under `streamlit run`
+    if STREAMLIT_DIR not in sys.path:
+        sys.path.insert(0, STREAMLIT_DIR)
+    return importlib.import_module('weather_app')
+
+
+def action_group_event(function, city=None, session_attributes=None):
+    parameters = []
+    if city is not None:
+        parameters.append({'name': 'city', 'type': 'string', 'value': city})
+    return {
+        'messageVersion': '1.0',
+        'actionGroup': 'WeatherActionGroup',
+        'function': function,
+        'parameters': parameters,
+        'sessionAttributes': dict(session_attributes or {}),
+        'promptSessionAttributes': {},
+    }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def report(label, samples, extra=''):
+    ms = [s * 1000.0 for s in samples]
+    print(f'{label:<28} n={len(ms):<6} p50={percentile(ms, 50):8.3f}ms '
+          f'p95={percentile(ms, 95):8.3f}ms p99={percentile(ms, 99):8.3f}ms {extra}')
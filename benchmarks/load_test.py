@@ -0,0 +1,365 @@
+"""Replay a traffic mix at a target request rate against the Lambda handlers
+and the Streamlit app's question path, fully offline.
+
+Nominatim and api.weather.gov are local HTTPS stand-ins and the Bedrock agent
+is benchmarks.fake_agent, all with configurable latency and error injection.
+Requests are issued open-loop at --rps, and latency is measured from when each
+request was due, so time spent queueing behind a saturated target counts.
+
+A traffic mix is a JSON lines file, one request per line:
+
+    {"target": "geocode_city", "city": "Seattle"}
+    {"target": "get_weather", "city": "Boston", "latitude": "42.36", "longitude": "-71.06"}
+    {"target": "get_weather", "locations": "Boston; Denver; Miami"}
+    {"target": "get_city_weather", "city": "Denver"}
+    {"target": "app", "question": "weather in Chicago tomorrow", "conversation": "c1"}
+
+Lines with a "weight" are sampled in proportion to it; a file without weights
+is replayed in order, as recorded. Results carry the git commit and the run's
+settings; --output saves them and --compare prints the change against a
+saved run.
+
+    python -m benchmarks.load_test --rps 20 --duration 30 --output before.json
+    python -m benchmarks.load_test --rps 20 --duration 30 --compare before.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import urllib3
+
+from benchmarks.fake_agent import FakeAgentRuntime, LocalLambdaClient
+from benchmarks.harness import ROOT, action_group_event, load_lambda, load_streamlit_app, percentile
+from benchmarks.standins import NoaaHandler, NominatimHandler, StandInServer
+
+DEFAULT_MIX = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traffic', 'default.jsonl')
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'throughput_rps', 'error_rate')
+# Settings that do not change what is measured
+UNCOMPARED = ('output', 'compare')
+
+
+def read_mix(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def plan_requests(mix, count, seed):
+    if any('weight' in record for record in mix):
+        rng = random.Random(seed)
+        return rng.choices(mix, weights=[record.get('weight', 1) for record in mix], k=count)
+    return [mix[i % len(mix)] for i in range(count)]
+
+
+class Failed(Exception):
+    pass
+
+
+class AppPath:
+    """What weather_app.main() does with a question, minus the rendering.
+
+    Same order as the app: the shared answer cache, then the weather Lambda
+    for plain weather questions, then the agent through the shared
+    AgentInvoker. Returns the path that answered.
+    """
+
+    def __init__(self, app, agent_client, lambda_client=None, response_cache=None, invoker=None):
+        self.app = app
+        self.agent_client = agent_client
+        self.lambda_client = lambda_client
+        self.response_cache = response_cache
+        self.invoker = invoker or app.AgentInvoker()
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, key):
+        with self._lock:
+            if key not in self._sessions:
+                self._sessions[key] = self.app.new_agent_session()
+            return self._sessions[key]
+
+    def ask(self, question, key):
+        app = self.app
+        timings = {}
+        start = time.perf_counter()
+        query = app.parse_weather_query(question)
+        if query and self.response_cache is not None and self.response_cache.lookup(query):
+            return 'cache'
+        path = answer = forecast = None
+        if query and self.lambda_client is not None:
+            path = 'weather function'
+            forecast = app.fetch_forecast(query['city'], self.lambda_client)
+            answer = app.format_forecast(forecast, query['city'], query['when']) if app.exact_place(forecast) else None
+            timings['total'] = time.perf_counter() - start
+        location = None
+        if answer is None:
+            path = 'agent'
+            session = self.session(key)
+            observations = []
+            if query and self.lambda_client is None:
+                def chunks(cancelled):
+                    return app.stream_weather_data(query['city'], self.agent_client, timings, session,
+                                                   observations, query['when'], cancelled)
+            else:
+                def chunks(cancelled):
+                    return app.stream_bedrock_agent('FAKEAGENT', question, self.agent_client, timings,
+                                                    session, observations, cancelled)
+            try:
+                answer = ''.join(self.invoker.stream(key, chunks, timings))
+            except app.AgentBusy:
+                return 'busy'
+            except app.AgentCancelled:
+                return 'cancelled'
+            forecast = app.extract_forecast(observations)
+            location = app.extract_location(observations)
+        elif forecast:
+            location = float(forecast['location']['latitude']), float(forecast['location']['longitude'])
+        if query and location and app.exact_place(forecast) and self.response_cache is not None:
+            answer = app.format_forecast(forecast, query['city'], query['when'])
+            if answer:
+                self.response_cache.store(query, *location, answer, forecast, timings.get('total'))
+        return path
+
+
+class Targets:
+    # The handlers and the app path, wired to the stand-ins
+
+    def __init__(self, args, noaa_server, nominatim_server, gazetteer_path):
+        env = {
+            'NOAA_API_URL': noaa_server.base_url,
+            'NOMINATIM_URL': nominatim_server.base_url,
+            'GAZETTEER_PATH': gazetteer_path,
+            # One process stands in for many execution environments
+            'HEDGE_MAX_WORKERS': str(8 * args.workers),
+        }
+        self.handlers = {
+            'geocode_city': load_lambda('geocode_city', 'OpenStreamMapAPI_Lambda', env=env),
+            'get_weather': load_lambda('get_weather', 'NOAA_API_Weather_Lambda', env=env),
+            'get_city_weather': load_lambda('get_city_weather', 'City_Weather_Lambda', env=env),
+        }
+        # The stand-ins use a throwaway certificate
+        from weather_common import geocoding, noaa
+        noaa.http = noaa.make_http_client(ca_certs=noaa_server.ca_certs)
+        geocoding.http = urllib3.PoolManager(maxsize=2, ca_certs=nominatim_server.ca_certs,
+                                             headers=dict(geocoding.http.headers))
+
+        self.agent = FakeAgentRuntime(
+            action=self.handlers['get_city_weather'].lambda_handler,
+            model_latency=args.model_latency, jitter=args.model_jitter,
+            chunk_interval=args.chunk_interval, error_rate=args.agent_error_rate,
+            action_latency=args.lambda_latency, seed=args.seed,
+        )
+        app = load_streamlit_app()
+        lambda_client = None
+        if not args.no_fast_path:
+            app.WEATHER_FUNCTION_NAME = 'get_city_weather'
+            lambda_client = LocalLambdaClient(self.handlers, latency=args.lambda_latency)
+        self.app = AppPath(
+            app, self.agent, lambda_client,
+            None if args.no_response_cache else app.ResponseCache(),
+            app.AgentInvoker(max_concurrency=args.agent_concurrency, max_queue=args.agent_queue),
+        )
+        self.lambda_latency = args.lambda_latency
+        self.lambda_timeout = args.lambda_timeout
+
+    def invoke(self, record):
+        # The outcome label for one request; raises Failed for error responses
+        target = record['target']
+        if target == 'app':
+            return self.app.ask(record['question'], record.get('conversation') or os.urandom(8).hex())
+        if self.lambda_latency:
+            time.sleep(self.lambda_latency)
+        event = action_group_event(target, city=record.get('city'), session_attributes={
+            name: record[name] for name in ('latitude', 'longitude') if name in record
+        })
+        if record.get('locations'):
+            event['parameters'].append({'name': 'locations', 'type': 'string', 'value': record['locations']})
+        response = self.handlers[target].lambda_handler(event, None)['response']['functionResponse']
+        body = response['responseBody']['TEXT']['body']
+        if response.get('responseState') == 'FAILURE':
+            raise Failed(body)
+        # Served from the last cached forecast because NOAA did not answer in time
+        return 'stale' if '"stale":' in body else 'ok'
+
+
+def run_load(targets, plan, rps, workers):
+    # Issue plan[i] at start + i / rps whether or not earlier requests finished.
+    # Each target has its own `workers`, as separate Lambdas and the Streamlit
+    # server would, so a saturated one does not hold up the others
+    rows = []
+    lock = threading.Lock()
+
+    def execute(record, due):
+        started = time.perf_counter()
+        try:
+            outcome = targets.invoke(record)
+        except Failed:
+            outcome = 'failure'
+        except Exception as e:
+            outcome = 'error: ' + type(e).__name__
+        finished = time.perf_counter()
+        if record['target'] != 'app' and targets.lambda_timeout and finished - started > targets.lambda_timeout:
+            # Lambda would have cut this invocation off
+            outcome = 'timeout'
+
+        with lock:
+            rows.append((record['target'], finished - due, outcome, finished))
+
+    pools = {target: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=target)
+             for target in {record['target'] for record in plan}}
+    start = time.perf_counter()
+    for i, record in enumerate(plan):
+        due = start + i / rps
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pools[record['target']].submit(execute, record, due)
+    for pool in pools.values():
+        pool.shutdown(wait=True)
+    return rows, max(row[3] for row in rows) - start if rows else 0.0
+
+
+def summarize(rows, elapsed):
+    def stats(selected):
+        ms = [row[1] * 1000.0 for row in selected]
+        outcomes = Counter(row[2] for row in selected)
+        errors = sum(count for outcome, count in outcomes.items()
+                     if outcome in ('failure', 'busy', 'cancelled', 'timeout') or outcome.startswith('error'))
+        return {
+            'requests': len(selected),
+            'p50_ms': round(percentile(ms, 50), 3),
+            'p95_ms': round(percentile(ms, 95), 3),
+            'p99_ms': round(percentile(ms, 99), 3),
+            'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+            'throughput_rps': round(len(selected) / elapsed, 3) if elapsed else 0.0,
+            'error_rate': round(errors / len(selected), 4) if selected else 0.0,
+            'outcomes': dict(outcomes),
+        }
+
+    results = {target: stats([row for row in rows if row[0] == target])
+               for target in sorted({row[0] for row in rows})}
+    results['all'] = stats(rows)
+    return results
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return git('rev-parse', 'HEAD'), bool(git('status', '--porcelain', '--untracked-files=no'))
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def print_results(results):
+    for target, stats in results.items():
+        outcomes = ' '.join(f'{name}={count}' for name, count in sorted(stats['outcomes'].items()))
+        print(f"{target:<18} n={stats['requests']:<6} p50={stats['p50_ms']:9.3f}ms p95={stats['p95_ms']:9.3f}ms "
+              f"p99={stats['p99_ms']:9.3f}ms {stats['throughput_rps']:7.2f} req/s  {outcomes}")
+
+
+def print_comparison(baseline, current):
+    print(f"\ncompared with {baseline.get('commit') or 'unknown commit'}"
+          f"{' (uncommitted changes)' if baseline.get('dirty') else ''}")
+    changed = sorted(name for name in set(baseline['config']) | set(current['config'])
+                     if baseline['config'].get(name) != current['config'].get(name))
+    if changed:
+        print('warning: settings differ: ' + ', '.join(
+            f"{name} {baseline['config'].get(name)!r} -> {current['config'].get(name)!r}" for name in changed))
+    for target, stats in current['results'].items():
+        before = baseline['results'].get(target)
+        if before is None:
+            continue
+        deltas = []
+        for metric in METRICS:
+            old, new = before[metric], stats[metric]
+            change = f'{(new - old) / old:+.1%}' if old else 'n/a'
+            deltas.append(f'{metric}={old:g}->{new:g} ({change})')
+        print(f'{target:<18} ' + ' '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='traffic mix, JSON lines')
+    parser.add_argument('--rps', type=float, default=20.0, help='target request rate')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of traffic to send')
+    parser.add_argument('--workers', type=int, default=64, help='concurrent requests in flight per target')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=float, default=0.05, help='stand-in latency per HTTP request, seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='extra uniform stand-in latency, up to seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of stand-in responses that are 503s')
+    parser.add_argument('--noaa-outage', metavar='START:DURATION',
+                        help='seconds into the run when api.weather.gov stops answering, and for how long')
+    parser.add_argument('--max-age', type=int, default=600, help='Cache-Control max-age of NOAA forecasts')
+    parser.add_argument('--gazetteer', help='gazetteer index to answer geocodes from (default: Nominatim only)')
+    parser.add_argument('--lambda-latency', type=float, default=0.01, help='Lambda invoke overhead, seconds')
+    parser.add_argument('--lambda-timeout', type=float, default=3.0,
+                        help='count Lambda invocations slower than this as timeouts (the CDK default)')
+    parser.add_argument('--model-latency', type=float, default=0.4, help='agent model call latency, seconds')
+    parser.add_argument('--model-jitter', type=float, default=0.2)
+    parser.add_argument('--chunk-interval', type=float, default=0.005, help='seconds between answer chunks')
+    parser.add_argument('--agent-error-rate', type=float, default=0.0, help='share of invoke_agent calls throttled')
+    parser.add_argument('--agent-concurrency', type=int, default=8)
+    parser.add_argument('--agent-queue', type=int, default=32)
+    parser.add_argument('--no-fast-path', action='store_true', help='send plain weather questions to the agent')
+    parser.add_argument('--no-response-cache', action='store_true', help='disable the app answer cache')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='results JSON from an earlier run to compare with')
+    args = parser.parse_args()
+
+    # Outside `streamlit run` every cache call warns about the missing runtime
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    # The handlers log to the root logger, which CloudWatch collects in Lambda
+    logging.getLogger().addHandler(logging.NullHandler())
+    mix = read_mix(args.mix)
+    plan = plan_requests(mix, max(1, int(args.rps * args.duration)), args.seed)
+    injection = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    outage = tuple(float(part) for part in args.noaa_outage.split(':')) if args.noaa_outage else None
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            StandInServer(NoaaHandler, max_age=args.max_age, outage=outage, **injection) as noaa_server, \
+            StandInServer(NominatimHandler, **injection) as nominatim_server:
+        targets = Targets(args, noaa_server, nominatim_server,
+                          args.gazetteer or os.path.join(tmp, 'no-gazetteer.sqlite'))
+        rows, elapsed = run_load(targets, plan, args.rps, args.workers)
+        upstreams = {
+            'noaa': {'requests': noaa_server.requests, 'errors': noaa_server.errors},
+            'nominatim': {'requests': nominatim_server.requests, 'errors': nominatim_server.errors},
+            'agent': {'requests': targets.agent.calls, 'errors': targets.agent.errors},
+        }
+
+    commit, dirty = git_revision()
+    current = {
+        'commit': commit,
+        'dirty': dirty,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': {name: value for name, value in vars(args).items() if name not in UNCOMPARED},
+        'elapsed_seconds': round(elapsed, 3),
+        'results': summarize(rows, elapsed),
+        'upstreams': upstreams,
+    }
+    print(f"{len(rows)} requests in {elapsed:.1f}s at target {args.rps:g} req/s, commit {(commit or 'unknown')[:12]}")
+    print_results(current['results'])
+    print('upstreams: ' + ' '.join(f"{name}={u['requests']} ({u['errors']} errors)" for name, u in upstreams.items()))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), current)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
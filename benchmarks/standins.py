@@ -0,0 +1,228 @@
+"""Local HTTPS stand-ins for the public APIs the Lambdas call.
+
+The servers speak HTTP/1.1 with keep-alive so connection reuse in the client
+is visible, count accepted connections, and can inject latency (a fixed
+delay plus uniform jitter), a rate of 503 responses, and an outage: a window
+of time during which every request hangs for `outage_latency` and then fails.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_self_signed_cert(directory):
+    # Throwaway certificate for localhost; clients trust it via ca_certs
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+         '-keyout', key, '-out', cert, '-days', '1', '-subj', '/CN=localhost',
+         '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1'],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return cert, key
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cacheable(self, payload):
+        # Same caching headers as NOAA, with ETag revalidation
+        body = json.dumps(payload).encode('utf-8')
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        headers = {'Cache-Control': f'public, max-age={self.server.max_age}', 'ETag': etag}
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_json(payload, headers=headers)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            delay = server.latency + server.jitter * server.random.random()
+            failed = server.error_rate and server.random.random() < server.error_rate
+            if server.in_outage():
+                delay, failed = server.outage_latency, True
+            if failed:
+                server.errors += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            self.send_json({'detail': 'Service Unavailable'}, status=503)
+            return
+        self.route()
+
+    def route(self):
+        self.send_json({'detail': 'Not Found'}, status=404)
+
+
+class NoaaHandler(StandInHandler):
+    # Minimal imitation of /points/{lat},{lon} and /gridpoints/.../forecast[/hourly]
+    points_re = re.compile(r'^/points/(-?[\d.]+),(-?[\d.]+)$')
+    forecast_re = re.compile(r'^/gridpoints/(\w+)/(\d+),(\d+)/forecast(/hourly)?$')
+
+    def route(self):
+        points = self.points_re.match(self.path)
+        if points:
+            lat, lon = float(points.group(1)), float(points.group(2))
+            grid_x, grid_y = int(abs(lat) * 10) % 200, int(abs(lon) * 10) % 200
+            forecast_url = f'{self.server.base_url}/gridpoints/TST/{grid_x},{grid_y}/forecast'
+            self.send_json({
+                'properties': {
+                    'gridId': 'TST',
+                    'gridX': grid_x,
+                    'gridY': grid_y,
+                    'forecast': forecast_url,
+                    'forecastHourly': f'{forecast_url}/hourly',
+                }
+            })
+            return
+        forecast = self.forecast_re.match(self.path)
+        if forecast:
+            hourly = bool(forecast.group(4))
+            self.send_cacheable({'properties': {'periods': forecast_periods(
+                count=48 if hourly else 14, hours=1 if hourly else 12)}})
+            return
+        super().route()
+
+
+def forecast_periods(count, hours):
+    # Consecutive periods starting at the current hour, shaped like NOAA's
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    periods = []
+    for number in range(1, count + 1):
+        end = start + timedelta(hours=hours)
+        temperature = 60 + number % 8
+        periods.append({
+            'number': number,
+            'name': '' if hours == 1 else f'Period {number}',
+            'startTime': start.isoformat(),
+            'endTime': end.isoformat(),
+            'temperature': temperature,
+            'temperatureUnit': 'F',
+            'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': number * 5 % 100},
+            'windSpeed': '5 to 10 mph',
+            'windDirection': 'NW',
+            'shortForecast': 'Sunny',
+            'detailedForecast': f'Sunny, with a high near {temperature}.',
+        })
+        start = end
+    return periods
+
+
+class NominatimHandler(StandInHandler):
+    # /search?q=...&format=json&limit=1; "nowhere..." queries return no results
+    def route(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/search':
+            super().route()
+            return
+        query = urllib.parse.parse_qs(url.query).get('q', [''])[0]
+        if query.lower().startswith('nowhere'):
+            self.send_json([])
+            return
+        seed = int(hashlib.md5(query.lower().encode('utf-8')).hexdigest()[:8], 16)
+        self.send_json([{
+            'lat': f'{25 + seed % 2400 / 100.0:.4f}',
+            'lon': f'{-124 + seed % 5700 / 100.0:.4f}',
+            'display_name': query,
+        }])
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler_cls, latency=0.0, tls=True, max_age=600, jitter=0.0, error_rate=0.0, seed=None,
+                 outage=None, outage_latency=10.0):
+        super().__init__(('127.0.0.1', 0), handler_cls)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # (start, duration) in seconds after the server starts
+        self.outage = outage
+        self.outage_latency = outage_latency
+        self.started = None
+        self.random = random.Random(seed)
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.ca_certs = None
+        self._tmpdir = None
+        scheme = 'http'
+        if tls:
+            self._tmpdir = tempfile.TemporaryDirectory()
+            cert, key = make_self_signed_cert(self._tmpdir.name)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert, key)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+            self.ca_certs = cert
+            scheme = 'https'
+        self.base_url = f'{scheme}://localhost:{self.server_address[1]}'
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        self._thread.start()
+        return self
+
+    def in_outage(self):
+        if not self.outage:
+            return False
+        start, duration = self.outage
+        return start <= time.monotonic() - self.started < start + duration
+
+    def handle_error(self, request, client_address):
+        # Clients that stop waiting (timeouts, hedged attempts) close mid-response
+        error = sys.exc_info()[1]
+        if not isinstance(error, (ConnectionError, ssl.SSLError)):
+            super().handle_error(request, client_address)
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections = 0
+            self.requests = 0
+            self.errors = 0
+
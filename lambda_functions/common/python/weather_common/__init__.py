@@ -0,0 +1 @@
+"""Code shared by the weather agent Lambdas, deployed as a Lambda layer."""
@@ -0,0 +1,126 @@
+"""Bedrock Agents action-group events and responses.
+
+`ActionGroupRequest.from_event` parses the Lambda event once (parameters
+become a dict) and builds the response envelope, so handlers only deal with
+their own logic. `dumps` is the JSON serializer for payloads embedded in
+response bodies; it uses orjson when the layer was built with it.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on how the layer was built
+    orjson = None
+
+MESSAGE_VERSION = '1.0'
+
+# Bedrock rejects action-group responses larger than 25 KB
+MAX_BODY_BYTES = 25 * 1024 - 1024
+
+REPROMPT = 'REPROMPT'
+FAILURE = 'FAILURE'
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+    loads = json.loads
+
+
+class BodyWriter:
+    """Assemble a large response body piece by piece.
+
+    Action-group responses cannot be streamed back to the agent, so the body
+    is built incrementally (no repeated string concatenation) and capped at
+    the size Bedrock accepts, with a note when it had to be truncated.
+    """
+
+    __slots__ = ('_parts', '_size', 'limit', 'truncated')
+
+    def __init__(self, limit=MAX_BODY_BYTES):
+        self._parts = []
+        self._size = 0
+        self.limit = limit
+        self.truncated = False
+
+    def write(self, text):
+        if self.truncated:
+            return False
+        size = len(text.encode('utf-8'))
+        if self._size + size > self.limit:
+            self.truncated = True
+            return False
+        self._parts.append(text)
+        self._size += size
+        return True
+
+    def writelines(self, lines, separator='\n'):
+        for i, line in enumerate(lines):
+            if not self.write(separator + line if i else line):
+                break
+        return self
+
+    def getvalue(self):
+        body = ''.join(self._parts)
+        if self.truncated:
+            body += '\n[Response truncated]'
+        return body
+
+
+class ActionGroupRequest:
+
+    __slots__ = ('action_group', 'function', 'parameters', 'session_attributes',
+                 'prompt_session_attributes', 'input_text')
+
+    def __init__(self, action_group, function, parameters, session_attributes,
+                 prompt_session_attributes, input_text=None):
+        self.action_group = action_group
+        self.function = function
+        self.parameters = parameters
+        self.session_attributes = session_attributes
+        self.prompt_session_attributes = prompt_session_attributes
+        self.input_text = input_text
+
+    @classmethod
+    def from_event(cls, event):
+        return cls(
+            event.get('actionGroup'),
+            event.get('function'),
+            {p['name']: p.get('value') for p in event.get('parameters') or ()},
+            event.get('sessionAttributes') or {},
+            event.get('promptSessionAttributes') or {},
+            event.get('inputText'),
+        )
+
+    def get(self, name, default=None):
+        return self.parameters.get(name, default)
+
+    def respond(self, body, state=None):
+        # `state` is REPROMPT, FAILURE, or None for a plain success
+        if isinstance(body, BodyWriter):
+            body = body.getvalue()
+        function_response = {'responseBody': {'TEXT': {'body': body}}}
+        if state is not None:
+            function_response['responseState'] = state
+        return {
+            'messageVersion': MESSAGE_VERSION,
+            'response': {
+                'actionGroup': self.action_group,
+                'function': self.function,
+                'functionResponse': function_response,
+            },
+            'sessionAttributes': self.session_attributes,
+            'promptSessionAttributes': self.prompt_session_attributes,
+        }
+
+    def reprompt(self, body):
+        return self.respond(body, REPROMPT)
+
+    def failure(self, body):
+        return self.respond(body, FAILURE)
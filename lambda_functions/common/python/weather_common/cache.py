@@ -0,0 +1,239 @@
+"""Two-tier lookup cache: an in-process LRU in front of a durable store.
+
+The LRU lives for the lifetime of the Lambda execution environment, so warm
+invocations answer repeat lookups without any I/O. The durable store is shared
+by every environment: DynamoDB in production, SQLite for local runs and tests.
+Values must be JSON serializable.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU with an optional per-entry expiry time."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= (now or time.time()):
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStore:
+    """Durable store backed by a local SQLite file (or ':memory:')."""
+
+    def __init__(self, path=':memory:'):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(pk TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)'
+            )
+
+    def get(self, key, now=None):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM cache WHERE pk = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= (now or time.time()):
+            return None, None
+        return json.loads(value), expires_at
+
+    def put(self, key, value, expires_at=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (pk, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), expires_at),
+            )
+
+    def add(self, key, value, expires_at, now=None):
+        # Insert only if the key is absent or expired; True when written
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO cache (pk, value, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (pk) DO UPDATE SET value = excluded.value, '
+                'expires_at = excluded.expires_at WHERE cache.expires_at <= ?',
+                (key, json.dumps(value), expires_at, now or time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM cache WHERE pk = ?', (key,))
+
+
+class DynamoDBStore:
+    """Durable store backed by a DynamoDB table keyed on a string 'pk'.
+
+    'expires_at' doubles as the table's TTL attribute. DynamoDB removes expired
+    items lazily, so reads check the expiry themselves.
+    """
+
+    def __init__(self, table_name, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('dynamodb')
+        self.table_name = table_name
+        self._client = client
+
+    def get(self, key, now=None):
+        item = self._client.get_item(
+            TableName=self.table_name, Key={'pk': {'S': key}}
+        ).get('Item')
+        if not item:
+            return None, None
+        expires_at = float(item['expires_at']['N']) if 'expires_at' in item else None
+        if expires_at is not None and expires_at <= (now or time.time()):
+            return None, None
+        return json.loads(item['value']['S']), expires_at
+
+    def put(self, key, value, expires_at=None):
+        item = {'pk': {'S': key}, 'value': {'S': json.dumps(value)}}
+        if expires_at is not None:
+            item['expires_at'] = {'N': str(int(expires_at))}
+        self._client.put_item(TableName=self.table_name, Item=item)
+
+    def add(self, key, value, expires_at, now=None):
+        # Conditional put: only if the key is absent or expired; True when written
+        try:
+            self._client.put_item(
+                TableName=self.table_name,
+                Item={
+                    'pk': {'S': key},
+                    'value': {'S': json.dumps(value)},
+                    'expires_at': {'N': str(int(expires_at))},
+                },
+                ConditionExpression='attribute_not_exists(pk) OR expires_at <= :now',
+                ExpressionAttributeValues={':now': {'N': str(int(now or time.time()))}},
+            )
+        except self._client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def delete(self, key):
+        self._client.delete_item(TableName=self.table_name, Key={'pk': {'S': key}})
+
+
+def store_from_env():
+    # DynamoDB when deployed, SQLite when a local path is configured, else LRU only
+    table_name = os.environ.get('CACHE_TABLE_NAME')
+    if table_name:
+        return DynamoDBStore(table_name)
+    sqlite_path = os.environ.get('CACHE_SQLITE_PATH')
+    if sqlite_path:
+        return SQLiteStore(sqlite_path)
+    return None
+
+
+class TieredCache:
+    """LRU in front of an optional durable store, with keys namespaced by prefix.
+
+    Durable-store failures are treated as misses so a cache outage never fails
+    the request that is using it.
+    """
+
+    def __init__(self, namespace, maxsize=1024, store=None):
+        self.namespace = namespace
+        self.lru = LRUCache(maxsize)
+        self.store = store
+
+    def _key(self, key):
+        return f'{self.namespace}#{key}'
+
+    def get(self, key):
+        full_key = self._key(key)
+        value = self.lru.get(full_key)
+        if value is not None or self.store is None:
+            return value
+        try:
+            value, expires_at = self.store.get(full_key)
+        except Exception:
+            return None
+        if value is not None:
+            self.lru.set(full_key, value, expires_at)
+        return value
+
+    def set(self, key, value, ttl=None):
+        full_key = self._key(key)
+        expires_at = time.time() + ttl if ttl is not None else None
+        self.lru.set(full_key, value, expires_at)
+        if self.store is not None:
+            try:
+                self.store.put(full_key, value, expires_at)
+            except Exception:
+                pass
+
+    def delete(self, key):
+        full_key = self._key(key)
+        self.lru.delete(full_key)
+        if self.store is not None:
+            try:
+                self.store.delete(full_key)
+            except Exception:
+                pass
+
+    def peek(self, key):
+        # Read straight from the durable store, bypassing the LRU
+        if self.store is None:
+            return self.get(key)
+        try:
+            value, expires_at = self.store.get(self._key(key))
+        except Exception:
+            return None
+        if value is not None:
+            self.lru.set(self._key(key), value, expires_at)
+        return value
+
+    def acquire_lease(self, key, ttl):
+        # Claim the right to compute `key` across execution environments.
+        # Without a durable store (or if it fails) every caller is its own leader.
+        if self.store is None:
+            return True
+        try:
+            return self.store.add(f'lease#{self._key(key)}', 1, time.time() + ttl)
+        except Exception:
+            return True
+
+    def release_lease(self, key):
+        if self.store is not None:
+            try:
+                self.store.delete(f'lease#{self._key(key)}')
+            except Exception:
+                pass
@@ -0,0 +1,140 @@
+"""Offline city gazetteer compiled from a GeoNames cities dump.
+
+The index is a read-only SQLite file opened immutable and memory-mapped, with
+one row per normalized place name. Exact and prefix lookups are single
+indexed range scans, so a query costs microseconds instead of a round-trip to
+Nominatim. Build it with scripts/build_gazetteer.py.
+"""
+import csv
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.sqlite')
+
+# Shortest prefix worth answering locally; shorter ones go to Nominatim
+MIN_PREFIX = 4
+
+_punctuation = re.compile(r"[^\w\s,]")
+_spaces = re.compile(r'\s+')
+
+
+def normalize(text):
+    # Case-fold, strip accents and punctuation, collapse whitespace
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = _punctuation.sub(' ', text.casefold())
+    return _spaces.sub(' ', text).strip()
+
+
+def parse_query(query):
+    # "Seattle, WA" -> ('seattle', 'wa'); anything after a second comma is ignored
+    parts = [p.strip() for p in normalize(query).split(',')]
+    name = parts[0] if parts else ''
+    qualifier = parts[1] if len(parts) > 1 and parts[1] else None
+    return name, qualifier
+
+
+def read_geonames(lines, admin1_names=None, alternate_names=False):
+    # Yield (key, name, admin1, admin1_name, country, lat, lon, population)
+    # from the tab-separated GeoNames "cities" format
+    admin1_names = admin1_names or {}
+    for row in csv.reader(lines, delimiter='\t', quoting=csv.QUOTE_NONE):
+        if len(row) < 15:
+            continue
+        name, ascii_name, alternates = row[1], row[2], row[3]
+        country, admin1 = row[8], row[10]
+        admin1_name = admin1_names.get(f'{country}.{admin1}', '')
+        population = int(row[14] or 0)
+        keys = {normalize(name), normalize(ascii_name)}
+        if alternate_names and alternates:
+            keys.update(normalize(a) for a in alternates.split(','))
+        for key in keys:
+            if key:
+                yield (key, name, admin1, normalize(admin1_name), country,
+                       float(row[4]), float(row[5]), population)
+
+
+def read_admin1_names(lines):
+    # admin1CodesASCII.txt: "US.WA<TAB>Washington<TAB>Washington<TAB>5815135"
+    names = {}
+    for row in csv.reader(lines, delimiter='\t', quoting=csv.QUOTE_NONE):
+        if len(row) >= 2:
+            names[row[0]] = row[1]
+    return names
+
+
+def build_index(records, path):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            'CREATE TABLE places (key TEXT NOT NULL, name TEXT NOT NULL, admin1 TEXT, '
+            'admin1_name TEXT, country TEXT, lat REAL NOT NULL, lon REAL NOT NULL, '
+            'population INTEGER NOT NULL)'
+        )
+        conn.executemany('INSERT INTO places VALUES (?, ?, ?, ?, ?, ?, ?, ?)', records)
+        conn.execute('CREATE INDEX places_key ON places (key, population DESC)')
+    count = conn.execute('SELECT COUNT(*) FROM places').fetchone()[0]
+    conn.execute('VACUUM')
+    conn.close()
+    return count
+
+
+class Gazetteer:
+
+    def __init__(self, path=DEFAULT_PATH, mmap_size=64 * 1024 * 1024):
+        self.path = path
+        self._conn = sqlite3.connect(f'file:{path}?mode=ro&immutable=1', uri=True,
+                                     check_same_thread=False)
+        self._conn.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        self._lock = threading.Lock()
+
+    def _first(self, where, args, qualifier):
+        sql = 'SELECT name, admin1, country, lat, lon FROM places WHERE ' + where
+        if qualifier:
+            sql += ' AND (lower(admin1) = ? OR admin1_name = ? OR lower(country) = ?)'
+            args = args + (qualifier, qualifier, qualifier)
+        sql += ' ORDER BY population DESC LIMIT 1'
+        with self._lock:
+            return self._conn.execute(sql, args).fetchone()
+
+    def lookup(self, query):
+        # Best match as a Nominatim-shaped result dict, or None on a miss. "match"
+        # is "exact" when a place goes by the queried name, "prefix" otherwise
+        name, qualifier = parse_query(query)
+        if not name:
+            return None
+        match = 'exact'
+        row = self._first('key = ?', (name,), qualifier)
+        if row is None and len(name) >= MIN_PREFIX:
+            match = 'prefix'
+            row = self._first('key >= ? AND key < ?', (name, name + '\U0010ffff'), qualifier)
+        if row is None:
+            return None
+        place, admin1, country, lat, lon = row
+        return {
+            'lat': str(lat),
+            'lon': str(lon),
+            'display_name': ', '.join(p for p in (place, admin1, country) if p),
+            'source': 'gazetteer',
+            'match': match,
+        }
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_gazetteer():
+    # Shared instance for the bundled index, or None when it was not built
+    global _default
+    path = os.environ.get('GAZETTEER_PATH', DEFAULT_PATH)
+    if _default is None and os.path.exists(path):
+        with _default_lock:
+            if _default is None:
+                _default = Gazetteer(path)
+    return _default
@@ -0,0 +1,101 @@
+"""City geocoding shared by the geocode Lambdas.
+
+Lookups are answered from the bundled gazetteer when possible, then from the
+geocode cache, and only then from OpenStreetMap Nominatim, with concurrent
+misses for the same city coalesced into one rate-limited request.
+"""
+import json
+import os
+import urllib.parse
+import urllib3
+
+from weather_common.cache import TieredCache, store_from_env
+from weather_common.gazetteer import default_gazetteer, normalize, parse_query
+from weather_common.http_cache import UpstreamError
+from weather_common.ratelimit import limiter_from_env
+from weather_common.resilience import RequestPolicy, breakers_from_env
+from weather_common.singleflight import SingleFlight
+
+NOMINATIM_URL = os.environ.get('NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+
+# Shared across warm invocations; Nominatim requires an identifying User-Agent
+http = urllib3.PoolManager(
+    maxsize=2,
+    timeout=urllib3.Timeout(connect=2.0, read=5.0),
+    headers={'User-Agent': os.environ.get('NOMINATIM_USER_AGENT', 'bedrock-weather-chatbot (geocode)')},
+)
+
+# Nominatim allows about 1 request/s; the budget is shared by all execution environments
+rate_limiter = limiter_from_env()
+
+# Its usage policy also rules out hedged or repeated requests, so only the
+# circuit breaker applies: while Nominatim is failing, lookups fail fast
+policy = RequestPolicy(breakers_from_env(), connect_timeout=2.0, read_timeout=5.0)
+
+# What the Lambdas tell the agent when Nominatim cannot answer
+UNAVAILABLE_MESSAGE = ("The geocoding service (OpenStreetMap Nominatim) is not responding right now. "
+                       "Please try again in a few minutes.")
+
+
+# Nominatim results keyed by normalized city. Misses are cached too, for a
+# shorter time, so unknown places are not retried on every request.
+POSITIVE_TTL = int(os.environ.get('GEOCODE_CACHE_TTL', str(30 * 24 * 3600)))
+NEGATIVE_TTL = int(os.environ.get('GEOCODE_NEGATIVE_TTL', str(15 * 60)))
+
+geocode_cache = TieredCache(
+    'geocode',
+    maxsize=int(os.environ.get('GEOCODE_CACHE_SIZE', '1024')),
+    store=store_from_env(),
+)
+single_flight = SingleFlight(geocode_cache)
+
+
+def nominatim_search(city, deadline=None):
+    geocode_url = f'{NOMINATIM_URL}/search?q={urllib.parse.quote(city)}&format=json&limit=1'
+    rate_limiter.acquire(geocode_url, max_wait=None if deadline is None else min(rate_limiter.max_wait, deadline.remaining()))
+    geocode_response = policy.get(http, geocode_url, deadline=deadline)
+    if geocode_response.status != 200:
+        raise UpstreamError(geocode_url, geocode_response.status)
+    return json.loads(geocode_response.data.decode('utf-8'))
+
+
+def resolve_with_nominatim(city, key, deadline=None):
+    # A concurrent caller may have filled the cache since our lookup missed
+    entry = geocode_cache.get(key)
+    if entry is not None:
+        return entry
+
+    results = nominatim_search(city, deadline)
+    if results:
+        place = {'lat': results[0]['lat'], 'lon': results[0]['lon'],
+                 'display_name': results[0].get('display_name', city)}
+        entry = {'found': True, 'place': place}
+        geocode_cache.set(key, entry, ttl=POSITIVE_TTL)
+    else:
+        entry = {'found': False}
+        geocode_cache.set(key, entry, ttl=NEGATIVE_TTL)
+    return entry
+
+
+def with_match(city, place):
+    # Nominatim matches loosely ("good" finds Goodyear), so a result is only an
+    # "exact" match when its own name is the one asked for
+    name = normalize(place.get('display_name', '').split(',')[0])
+    return dict(place, match='exact' if name == parse_query(city)[0] else 'partial')
+
+
+def geocode_city(city, deadline=None):
+    # Answer from the bundled gazetteer, then the geocode cache; concurrent
+    # misses for the same city share a single Nominatim request. Places carry
+    # "match": "exact" when their name is the one asked for
+    gazetteer = default_gazetteer()
+    if gazetteer is not None:
+        place = gazetteer.lookup(city)
+        if place is not None:
+            return [place]
+
+    key = normalize(city)
+    entry = geocode_cache.get(key)
+    if entry is None:
+        entry = single_flight.do(key, lambda: resolve_with_nominatim(city, key, deadline), deadline)
+    return [with_match(city, entry['place'])] if entry['found'] else []
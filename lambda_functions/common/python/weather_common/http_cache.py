@@ -0,0 +1,157 @@
+"""HTTP response cache that follows the origin's caching headers.
+
+Entries are fresh until the time given by Cache-Control (max-age/s-maxage,
+less Age) or Expires. Stale entries are kept and revalidated with a
+conditional GET (If-None-Match / If-Modified-Since); a 304 refreshes the
+entry's lifetime without transferring the body again. When the upstream
+cannot be reached in time (rate limited, circuit open, out of budget, or
+failing with 5xx), a stale entry is served instead, along with its age.
+"""
+import json
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import urllib3
+
+from weather_common.ratelimit import RateLimited
+from weather_common.resilience import CircuitOpen, DeadlineExceeded, RETRY_STATUSES
+
+
+class UpstreamError(Exception):
+    def __init__(self, url, status):
+        super().__init__(f'{url} returned HTTP {status}')
+        self.url = url
+        self.status = status
+
+
+def _header(headers, name):
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    return value
+
+
+def freshness_lifetime(headers, default_ttl=0):
+    # Seconds the response may be served without revalidation
+    cache_control = _header(headers, 'Cache-Control') or ''
+    directives = {}
+    for part in cache_control.split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    if 'no-store' in directives or 'no-cache' in directives:
+        return 0
+    age = 0
+    try:
+        age = int(_header(headers, 'Age') or 0)
+    except ValueError:
+        pass
+    for directive in ('s-maxage', 'max-age'):
+        if directive in directives:
+            try:
+                return max(0, int(directives[directive]) - age)
+            except ValueError:
+                break
+    expires = _header(headers, 'Expires')
+    if expires:
+        try:
+            expires_at = parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return 0
+        date = _header(headers, 'Date')
+        try:
+            now = parsedate_to_datetime(date).timestamp() if date else time.time()
+        except (TypeError, ValueError):
+            now = time.time()
+        return max(0, int(expires_at - now))
+    return default_ttl
+
+
+def upstream_unavailable(error):
+    # Errors that mean "no answer right now", as opposed to an answer we cannot use
+    if isinstance(error, UpstreamError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (RateLimited, CircuitOpen, DeadlineExceeded, urllib3.exceptions.HTTPError))
+
+
+class ConditionalCache:
+    """Serve JSON GETs from a TieredCache, honouring the origin's freshness.
+
+    `retain` is how long entries stay in the cache after they go stale so
+    they can still be revalidated, or served when the upstream is down.
+    Requests go through `policy` (a resilience.RequestPolicy) when given.
+    """
+
+    def __init__(self, cache, retain=24 * 3600, default_ttl=0, rate_limiter=None, policy=None):
+        self.cache = cache
+        self.retain = retain
+        self.default_ttl = default_ttl
+        self.rate_limiter = rate_limiter
+        self.policy = policy
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'refetched': 0, 'stale': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _store(self, key, entry, headers):
+        entry['fetched_at'] = time.time()
+        entry['expires_at'] = entry['fetched_at'] + freshness_lifetime(headers, self.default_ttl)
+        self.cache.set(key, entry, ttl=self.retain)
+        return entry
+
+    def expires_at(self, key):
+        # When the cached response for `key` goes stale, or None if it is not cached
+        entry = self.cache.get(key)
+        return entry['expires_at'] if entry is not None else None
+
+    def fetch(self, http, url, key=None, transform=None, deadline=None):
+        return self.fetch_with_age(http, url, key, transform, deadline)[0]
+
+    def fetch_with_age(self, http, url, key=None, transform=None, deadline=None):
+        # (payload, age): age is None when the payload is current, otherwise the
+        # seconds since the stale entry served in its place was last validated
+        key = key or url
+        entry = self.cache.get(key)
+        if entry is not None and entry['expires_at'] > time.time():
+            self._count('hits')
+            return entry['payload'], None
+
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            if self.rate_limiter is not None:
+                max_wait = None if deadline is None else min(self.rate_limiter.max_wait, deadline.remaining())
+                self.rate_limiter.acquire(url, max_wait=max_wait)
+            if self.policy is not None:
+                response = self.policy.get(http, url, headers, deadline)
+            else:
+                response = http.request('GET', url, headers=headers)
+            if response.status == 304 and entry is not None:
+                self._count('revalidated')
+                return self._store(key, entry, response.headers)['payload'], None
+            if response.status != 200:
+                raise UpstreamError(url, response.status)
+        except Exception as e:
+            if entry is None or not upstream_unavailable(e):
+                raise
+            self._count('stale')
+            # Entries written before fetched_at was recorded only know when they expired
+            return entry['payload'], time.time() - entry.get('fetched_at', entry['expires_at'])
+
+        self._count('refetched' if entry is not None else 'misses')
+        payload = json.loads(response.data.decode('utf-8'))
+        if transform is not None:
+            payload = transform(payload)
+        entry = {
+            'payload': payload,
+            'etag': _header(response.headers, 'ETag'),
+            'last_modified': _header(response.headers, 'Last-Modified'),
+        }
+        return self._store(key, entry, response.headers)['payload'], None
@@ -0,0 +1,51 @@
+"""Stage timings for the Lambdas, reported in CloudWatch Embedded Metric Format.
+
+A handler times its stages with `Timings.measure`, then `emit` prints one JSON
+line per invocation. CloudWatch Logs turns each stage into a metric (in
+milliseconds, dimensioned by function) and keeps the line, with any extra
+properties, as a structured log entry.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from weather_common.action_group import dumps
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'WeatherApp')
+
+
+class Timings:
+
+    __slots__ = ('ms',)
+
+    def __init__(self):
+        self.ms = {}
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000.0
+            self.ms[name] = round(self.ms.get(name, 0.0) + elapsed, 3)
+
+
+def emf_record(function, metrics, properties=None, namespace=NAMESPACE, timestamp=None):
+    record = dict(properties or {})
+    record.update(metrics)
+    record['Function'] = function
+    record['_aws'] = {
+        'Timestamp': int((timestamp or time.time()) * 1000),
+        'CloudWatchMetrics': [{
+            'Namespace': namespace,
+            'Dimensions': [['Function']],
+            'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in metrics],
+        }],
+    }
+    return record
+
+
+def emit(function, metrics, properties=None):
+    # EMF lines must be bare JSON, so they bypass the logging formatter
+    print(dumps(emf_record(function, metrics, properties)), flush=True)
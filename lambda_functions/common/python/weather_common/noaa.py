@@ -0,0 +1,253 @@
+"""NOAA api.weather.gov client shared by the weather Lambdas.
+
+Resolves coordinates to a gridpoint (/points) and fetches its forecast, with
+a module-scope connection pool, per-host rate limiting, and caches for both
+lookups. Module state lives for the lifetime of the execution environment.
+
+Forecasts are returned as a compact, schema-versioned payload:
+
+    {"schema_version": 1,
+     "location": {"city": "Seattle", "latitude": "47.6", "longitude": "-122.3", "match": "exact"},
+     "periods": [{"name": "Tonight", "start": "...", "end": "...", "temp": 48,
+                  "unit": "F", "wind": "5 mph SW", "pop": 20, "short": "Rain Likely"}],
+     "hourly": [...],
+     "expires": 1760812800,
+     "stale": {"age_seconds": 5400, "as_of": 1760807400},
+     "timings": {"geocode": 12.5, "points": 0.4, "forecast": 85.1, "hourly": 90.3}}
+
+Fields with no value are omitted (hourly periods have no name). "match" is set
+when the city was geocoded: "exact" when the place found goes by that name,
+anything else when it was only a close match. "expires" is
+when the cached NOAA forecast goes stale (epoch seconds); answers derived
+from the payload should not be reused past it. "stale" is only present when
+api.weather.gov could not answer within the request's latency budget and the
+last cached forecast was served instead: "as_of" is when NOAA last confirmed
+it (epoch seconds). "timings" are the stages of the request that produced it,
+in milliseconds.
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import urllib3
+
+from weather_common.cache import TieredCache, store_from_env
+from weather_common.http_cache import ConditionalCache, UpstreamError, upstream_unavailable
+from weather_common.metrics import Timings
+from weather_common.ratelimit import limiter_from_env
+from weather_common.resilience import policy_from_env
+
+# Base URL for the NOAA API (overridable so benchmarks can point at a local stand-in)
+NOAA_API_URL = os.environ.get('NOAA_API_URL', 'https://api.weather.gov')
+
+# NOAA asks every client to identify itself with a User-Agent
+USER_AGENT = os.environ.get('NOAA_USER_AGENT', 'bedrock-weather-chatbot (weather-agent)')
+
+
+def make_http_client(**overrides):
+    # Keep-alive pool with bounded size and connect/read timeouts. Retries are
+    # left to `policy`, which hedges and stays within the request's deadline
+    options = {
+        'num_pools': 4,
+        'maxsize': int(os.environ.get('HTTP_POOL_MAXSIZE', '8')),
+        'timeout': urllib3.Timeout(
+            connect=float(os.environ.get('HTTP_CONNECT_TIMEOUT', '2.0')),
+            read=float(os.environ.get('HTTP_READ_TIMEOUT', '5.0')),
+        ),
+        'retries': False,
+        'headers': {'User-Agent': USER_AGENT, 'Accept': 'application/geo+json'},
+    }
+    options.update(overrides)
+    return urllib3.PoolManager(**options)
+
+
+# Created once per execution environment so warm invocations reuse open
+# connections to api.weather.gov instead of paying TCP/TLS setup on every call
+http = make_http_client()
+
+# Per-host request budget, shared by all execution environments
+rate_limiter = limiter_from_env()
+
+# Hedged attempts and a circuit breaker per host, within each request's deadline;
+# attempts after the first take their own rate-limit token
+policy = policy_from_env(rate_limiter=rate_limiter)
+
+
+class ForecastUnavailable(Exception):
+    def __init__(self, reason):
+        super().__init__('The National Weather Service (api.weather.gov) is not responding right now '
+                         'and there is no recent forecast for this location. Please try again in a few minutes.')
+        self.reason = reason
+
+
+def fetch_json(url, deadline=None):
+    # Never wait for a rate-limit slot longer than the request has left
+    rate_limiter.acquire(url, max_wait=None if deadline is None else min(rate_limiter.max_wait, deadline.remaining()))
+    response = policy.get(http, url, deadline=deadline)
+    if response.status != 200:
+        raise UpstreamError(url, response.status)
+    return json.loads(response.data.decode('utf-8'))
+
+
+# /points results are keyed on coordinates rounded to roughly the 2.5 km NOAA
+# grid, so nearby lookups for the same city share one entry
+POINTS_PRECISION = int(os.environ.get('POINTS_CACHE_PRECISION', '2'))
+POINTS_TTL = int(os.environ.get('POINTS_CACHE_TTL', str(30 * 24 * 3600)))
+
+durable_store = store_from_env()
+
+points_cache = TieredCache(
+    'points',
+    maxsize=int(os.environ.get('POINTS_CACHE_SIZE', '1024')),
+    store=durable_store,
+)
+
+# Version of the forecast payload; part of the cache namespace so a schema
+# change never serves entries written in the old shape
+SCHEMA_VERSION = 1
+FORECAST_PERIODS = int(os.environ.get('FORECAST_PERIODS', '4'))
+HOURLY_PERIODS = int(os.environ.get('HOURLY_PERIODS', '6'))
+HOURLY_RETAINED = 48
+
+# Parsed forecast periods per gridpoint, fresh for as long as NOAA's
+# Cache-Control/Expires headers allow and revalidated with ETags afterwards
+forecast_cache = ConditionalCache(
+    TieredCache(
+        f'forecast-v{SCHEMA_VERSION}',
+        maxsize=int(os.environ.get('FORECAST_CACHE_SIZE', '512')),
+        store=durable_store,
+    ),
+    retain=int(os.environ.get('FORECAST_CACHE_RETAIN', str(24 * 3600))),
+    rate_limiter=rate_limiter,
+    policy=policy,
+)
+
+
+def points_key(latitude, longitude):
+    return f'{round(float(latitude), POINTS_PRECISION)},{round(float(longitude), POINTS_PRECISION)}'
+
+
+def resolve_gridpoint(latitude, longitude, deadline=None):
+    # Gridpoint metadata for a coordinate practically never changes, so only
+    # call /points when neither the LRU nor the durable store knows it
+    key = points_key(latitude, longitude)
+    gridpoint = points_cache.get(key)
+    if gridpoint is None:
+        properties = fetch_json(f'{NOAA_API_URL}/points/{key}', deadline)['properties']
+        gridpoint = {
+            'gridId': properties.get('gridId'),
+            'gridX': properties.get('gridX'),
+            'gridY': properties.get('gridY'),
+            'forecast': properties['forecast'],
+            'forecastHourly': properties.get('forecastHourly'),
+        }
+        points_cache.set(key, gridpoint, ttl=POINTS_TTL)
+    return gridpoint
+
+
+def gridpoint_key(gridpoint):
+    if gridpoint.get('gridId'):
+        return f"{gridpoint['gridId']}/{gridpoint['gridX']},{gridpoint['gridY']}"
+    return gridpoint['forecast']
+
+
+def compact_period(period):
+    precipitation = (period.get('probabilityOfPrecipitation') or {}).get('value')
+    wind = f"{period.get('windSpeed') or ''} {period.get('windDirection') or ''}".strip()
+    compact = {
+        'name': period.get('name'),
+        'start': period.get('startTime'),
+        'end': period.get('endTime'),
+        'temp': period.get('temperature'),
+        'unit': period.get('temperatureUnit'),
+        'wind': wind,
+        'pop': precipitation,
+        'short': period.get('shortForecast'),
+    }
+    return {k: v for k, v in compact.items() if v not in (None, '')}
+
+
+def compact_periods(data, limit=None):
+    periods = data['properties']['periods']
+    if limit is not None:
+        periods = periods[:limit]
+    return [compact_period(period) for period in periods]
+
+
+def upcoming(periods, count, now=None):
+    # Skip periods that already ended (cached forecasts age)
+    now = now or datetime.now(timezone.utc)
+    result = []
+    for period in periods:
+        end = period.get('end')
+        if end and datetime.fromisoformat(end) <= now:
+            continue
+        result.append(period)
+        if len(result) == count:
+            break
+    return result
+
+
+def get_forecast_periods(gridpoint, deadline=None):
+    # (compact forecast periods, age) for a gridpoint, served from the forecast
+    # cache when fresh; age is set when a stale forecast stood in for NOAA
+    return forecast_cache.fetch_with_age(
+        http, gridpoint['forecast'],
+        key=gridpoint_key(gridpoint),
+        transform=compact_periods,
+        deadline=deadline,
+    )
+
+
+def get_hourly_periods(gridpoint, deadline=None):
+    return forecast_cache.fetch_with_age(
+        http, gridpoint['forecastHourly'],
+        key=f'{gridpoint_key(gridpoint)}/hourly',
+        transform=lambda data: compact_periods(data, HOURLY_RETAINED),
+        deadline=deadline,
+    )
+
+
+def build_forecast(latitude, longitude, city=None, hourly=True, timings=None, deadline=None):
+    # Raises ForecastUnavailable when NOAA cannot answer within `deadline` and
+    # nothing is cached to answer with
+    timings = timings or Timings()
+    try:
+        with timings.measure('points'):
+            gridpoint = resolve_gridpoint(latitude, longitude, deadline)
+        with timings.measure('forecast'):
+            periods, age = get_forecast_periods(gridpoint, deadline)
+    except Exception as e:
+        if upstream_unavailable(e):
+            raise ForecastUnavailable(str(e)) from e
+        raise
+    location = {'latitude': str(latitude), 'longitude': str(longitude)}
+    if city:
+        location['city'] = city
+    payload = {
+        'schema_version': SCHEMA_VERSION,
+        'location': location,
+        'periods': upcoming(periods, FORECAST_PERIODS),
+    }
+    ages = [age] if age is not None else []
+    if hourly and gridpoint.get('forecastHourly'):
+        try:
+            with timings.measure('hourly'):
+                hourly_periods, hourly_age = get_hourly_periods(gridpoint, deadline)
+        except Exception as e:
+            # The daily forecast is enough of an answer without the hourly one
+            if not upstream_unavailable(e):
+                raise
+        else:
+            payload['hourly'] = upcoming(hourly_periods, HOURLY_PERIODS)
+            if hourly_age is not None:
+                ages.append(hourly_age)
+    expires_at = forecast_cache.expires_at(gridpoint_key(gridpoint))
+    if expires_at is not None:
+        payload['expires'] = int(expires_at)
+    if ages:
+        age = max(ages)
+        payload['stale'] = {'age_seconds': int(age), 'as_of': int(time.time() - age)}
+    payload['timings'] = timings.ms
+    return payload
@@ -0,0 +1,151 @@
+"""Client-side rate limiting for the public APIs the Lambdas call.
+
+Each upstream host gets a token bucket, implemented as GCRA (a token bucket
+expressed as one "theoretical arrival time" per host) so the whole state is a
+single number. Under concurrency the number lives in a shared store, updated
+with compare-and-set, so all execution environments draw from one budget.
+Callers whose slot is less than `max_wait` away sleep until it; the rest are
+rejected with RateLimited so they can degrade to cached data.
+"""
+import os
+import threading
+import time
+import urllib.parse
+
+# requests per second, burst size
+DEFAULT_LIMITS = {
+    'nominatim.openstreetmap.org': (1.0, 1),
+    'api.weather.gov': (5.0, 10),
+}
+
+
+class RateLimited(Exception):
+    def __init__(self, host, retry_after):
+        super().__init__(f'{host} is busy, please try again in {retry_after:.1f}s')
+        self.host = host
+        self.retry_after = retry_after
+
+
+def _gcra(tat, now, interval, burst):
+    # Returns (seconds to wait, new arrival time) for one more request
+    start = max(tat, now)
+    wait = max(0.0, start - now - (burst - 1) * interval)
+    return wait, start + interval
+
+
+class MemoryRateStore:
+    """In-process store; the default, and the stand-in for tests."""
+
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key, interval, burst, max_wait, now):
+        # (granted, seconds to sleep first) or (not granted, seconds it would take)
+        with self._lock:
+            wait, tat = _gcra(self._tats.get(key, now), now, interval, burst)
+            if wait > max_wait:
+                return False, wait
+            self._tats[key] = tat
+            return True, wait
+
+
+class DynamoDBRateStore:
+    """Shared store on the cache table: one item per host, compare-and-set on 'tat'."""
+
+    def __init__(self, table_name, client=None, attempts=5):
+        if client is None:
+            import boto3
+            client = boto3.client('dynamodb')
+        self.table_name = table_name
+        self.attempts = attempts
+        self._client = client
+
+    def reserve(self, key, interval, burst, max_wait, now):
+        pk = {'S': f'ratelimit#{key}'}
+        for _ in range(self.attempts):
+            item = self._client.get_item(
+                TableName=self.table_name, Key={'pk': pk}, ConsistentRead=True
+            ).get('Item')
+            previous = item['tat']['N'] if item and 'tat' in item else None
+            wait, tat = _gcra(float(previous) if previous else now, now, interval, burst)
+            if wait > max_wait:
+                return False, wait
+            condition = {'ConditionExpression': 'attribute_not_exists(pk)'}
+            if previous is not None:
+                condition = {
+                    'ConditionExpression': 'tat = :previous',
+                    'ExpressionAttributeValues': {':previous': {'N': previous}},
+                }
+            try:
+                self._client.put_item(
+                    TableName=self.table_name,
+                    Item={'pk': pk, 'tat': {'N': repr(tat)},
+                          'expires_at': {'N': str(int(tat) + 3600)}},
+                    **condition,
+                )
+            except self._client.exceptions.ConditionalCheckFailedException:
+                now = time.time()
+                continue
+            return True, wait
+        return False, interval
+
+
+def parse_limits(spec):
+    # "api.weather.gov=5:10,nominatim.openstreetmap.org=1:1"
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        host, _, value = item.partition('=')
+        rate, _, burst = value.partition(':')
+        limits[host] = (float(rate), int(burst or 1))
+    return limits
+
+
+class RateLimiter:
+
+    def __init__(self, limits=None, store=None, max_wait=1.0, sleep=time.sleep):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.store = store or MemoryRateStore()
+        self.max_wait = max_wait
+        self._fallback = MemoryRateStore()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'rejected': 0}
+
+    def acquire(self, url, max_wait=None):
+        # Wait for this host's next slot, if it is at most `max_wait` away (the
+        # limiter's own by default); returns the seconds waited
+        max_wait = self.max_wait if max_wait is None else max_wait
+        host = urllib.parse.urlsplit(url).hostname or url
+        limit = self.limits.get(host)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        now = time.time()
+        try:
+            granted, wait = self.store.reserve(host, 1.0 / rate, burst, max_wait, now)
+        except Exception:
+            # Shared store unavailable: still protect the upstream from this process
+            granted, wait = self._fallback.reserve(host, 1.0 / rate, burst, max_wait, now)
+        with self._lock:
+            if not granted:
+                self.stats['rejected'] += 1
+            else:
+                self.stats['acquired'] += 1
+                if wait > 0:
+                    self.stats['waited'] += 1
+                    self.stats['wait_seconds'] += wait
+        if not granted:
+            raise RateLimited(host, wait)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+def limiter_from_env():
+    limits = dict(DEFAULT_LIMITS)
+    limits.update(parse_limits(os.environ.get('RATE_LIMITS', '')))
+    max_wait = float(os.environ.get('RATE_LIMIT_MAX_WAIT', '1.0'))
+    table_name = os.environ.get('CACHE_TABLE_NAME')
+    store = DynamoDBRateStore(table_name) if table_name else MemoryRateStore()
+    return RateLimiter(limits, store, max_wait)
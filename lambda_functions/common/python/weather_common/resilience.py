@@ -0,0 +1,303 @@
+"""Latency budgets for calls to the public APIs the Lambdas depend on.
+
+A `Deadline` is the time left to answer the current request; every attempt's
+timeouts are capped by it. `RequestPolicy.get` sends a GET and, if no answer
+has arrived after `hedge_after` seconds (or the attempt failed), sends another
+one, up to `attempts`, and returns the first good response. Each upstream host
+has a circuit breaker: when at least `failure_rate` of its last `window`
+requests failed (every attempt failed, or the deadline passed), it opens and
+requests fail fast with CircuitOpen for `reset_timeout` seconds; then one
+trial request decides whether it closes again. Breakers are per execution
+environment. Callers turn DeadlineExceeded and CircuitOpen into cached data
+where they have some.
+"""
+import os
+import random
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import urllib3
+
+from weather_common.ratelimit import RateLimited
+
+# Statuses that mean "no answer right now"; all but 429 are worth another
+# attempt, anything else is the upstream's answer
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Seconds an invocation may spend on upstream calls before answering from
+# cache; kept under the Lambda timeout (3 s by default) less DEADLINE_MARGIN
+REQUEST_BUDGET = float(os.environ.get('REQUEST_BUDGET_SECONDS', '2.5'))
+DEADLINE_MARGIN = 0.3
+
+# Attempts run here so the caller can stop waiting when its deadline passes.
+# Sized for a full multi-location request (10 locations, 3 attempts each)
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('HEDGE_MAX_WORKERS', '32')),
+                               thread_name_prefix='upstream')
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, url):
+        super().__init__(f'{url} did not answer in time')
+        self.url = url
+
+
+class CircuitOpen(Exception):
+    def __init__(self, host, retry_after):
+        super().__init__(f'{host} is failing, not retrying for another {retry_after:.0f}s')
+        self.host = host
+        self.retry_after = retry_after
+
+
+class Deadline:
+
+    __slots__ = ('at',)
+
+    def __init__(self, seconds):
+        self.at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.at
+
+
+def request_deadline(context=None, budget=None):
+    # The latency budget for one invocation, capped by the time the Lambda has left
+    budget = REQUEST_BUDGET if budget is None else budget
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        budget = min(budget, context.get_remaining_time_in_millis() / 1000.0 - DEADLINE_MARGIN)
+    return Deadline(max(budget, 0.0))
+
+
+class CircuitBreaker:
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, host, failure_rate=0.5, window=20, reset_timeout=15.0, clock=time.monotonic):
+        self.host = host
+        self.failure_rate = failure_rate
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # True for each failed request
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    def allow(self):
+        # Raises CircuitOpen unless a request may go out now
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            retry_after = self.opened_at + self.reset_timeout - self._clock()
+            if self.state == self.OPEN and retry_after <= 0:
+                # Let this one request through as the trial
+                self.state = self.HALF_OPEN
+                return
+            self.stats['rejected'] += 1
+        raise CircuitOpen(self.host, max(retry_after, 0.0))
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(False)
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(True)
+            # Judge on a half-full window at least, so a few early failures do not trip it
+            tripped = (len(self._outcomes) * 2 >= self._outcomes.maxlen
+                       and sum(self._outcomes) >= self.failure_rate * len(self._outcomes))
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and tripped):
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+                self.stats['opened'] += 1
+
+
+class CircuitBreakers:
+    """One CircuitBreaker per upstream host, created on first use."""
+
+    def __init__(self, failure_rate=0.5, window=20, reset_timeout=15.0, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        host = urllib.parse.urlsplit(url).hostname or url
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(
+                    host, self.failure_rate, self.window, self.reset_timeout, self._clock)
+            return breaker
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {host: breaker.state for host, breaker in self._breakers.items()}
+
+
+class RequestPolicy:
+    """Deadline-capped, hedged GETs guarded by per-host circuit breakers.
+
+    `hedge_after` of None only retries after a failed attempt. Retries wait a
+    jittered backoff (up to `backoff` * 2^n seconds) and are dropped when it
+    would run past the deadline; a 429 is never retried. Every attempt after
+    the first takes a token from `rate_limiter` when given, and is skipped if
+    none is free right away. Attempts go out without urllib3's own retries,
+    which would not respect the deadline.
+    """
+
+    def __init__(self, breakers=None, hedge_after=None, attempts=1, connect_timeout=2.0, read_timeout=5.0,
+                 backoff=0.1, rate_limiter=None):
+        self.breakers = breakers if breakers is not None else CircuitBreakers()
+        self.hedge_after = hedge_after
+        self.attempts = attempts
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'hedged': 0, 'retried': 0, 'timeouts': 0, 'rate_limited': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _timeout(self, deadline):
+        if deadline is None:
+            return urllib3.Timeout(connect=self.connect_timeout, read=self.read_timeout)
+        remaining = deadline.remaining()
+        return urllib3.Timeout(connect=min(self.connect_timeout, remaining),
+                               read=min(self.read_timeout, remaining), total=remaining)
+
+    def _backoff(self, failures):
+        # "Full jitter": anywhere between no wait and the exponential cap
+        return random.uniform(0, self.backoff * 2 ** (failures - 1))
+
+    def _take_token(self, url):
+        # Extra attempts are optional, so they never wait for a rate-limit slot
+        if self.rate_limiter is None:
+            return True
+        try:
+            self.rate_limiter.acquire(url, max_wait=0.0)
+        except RateLimited:
+            self._count('rate_limited')
+            return False
+        return True
+
+    def get(self, http, url, headers=None, deadline=None):
+        breaker = self.breakers.for_url(url)
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(url)
+        breaker.allow()
+        try:
+            return self._get(breaker, http, url, headers, deadline)
+        except BaseException:
+            # A half-open breaker waits to hear how its trial went; a trial that
+            # ran out of time early must still report, or no request would ever
+            # be let through again
+            if breaker.state == CircuitBreaker.HALF_OPEN:
+                breaker.record_failure()
+            raise
+
+    def _get(self, breaker, http, url, headers, deadline):
+        self._count('requests')
+        started = time.monotonic()
+        pending = set()
+        launched = failures = 0
+        # When the next attempt goes out, and whether it is a hedge or a retry
+        next_at, next_kind = None, None
+        last_response = last_error = None
+
+        def launch():
+            nonlocal launched, next_at, next_kind
+            launched += 1
+            pending.add(_executor.submit(http.request, 'GET', url, headers=headers or {},
+                                         timeout=self._timeout(deadline), retries=False))
+            next_at, next_kind = None, None
+            if self.hedge_after is not None and launched < self.attempts:
+                next_at, next_kind = time.monotonic() + self.hedge_after, 'hedged'
+
+        launch()
+        while pending or next_at is not None:
+            timeout = None if next_at is None else max(0.0, next_at - time.monotonic())
+            if deadline is not None:
+                timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+            if pending:
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                # Backing off before a retry
+                time.sleep(timeout)
+                done = set()
+            for future in done:
+                try:
+                    response = future.result()
+                except urllib3.exceptions.HTTPError as e:
+                    last_error = e
+                else:
+                    if response.status not in RETRY_STATUSES:
+                        breaker.record_success()
+                        return response
+                    if response.status == 429:
+                        # Asked to slow down; another attempt now would only add load
+                        breaker.record_failure()
+                        return response
+                    last_response = response
+                failures += 1
+                if launched < self.attempts:
+                    retry_at = time.monotonic() + self._backoff(failures)
+                    if (deadline is None or retry_at < deadline.at) and (next_at is None or retry_at < next_at):
+                        next_at, next_kind = retry_at, 'retried'
+            if deadline is not None and deadline.expired():
+                if pending:
+                    # Out of time; the attempts still in flight finish on their own. A
+                    # request that ran out before it could even be hedged says more
+                    # about the caller's budget than about the upstream.
+                    if time.monotonic() - started >= (self.hedge_after or 0.0):
+                        breaker.record_failure()
+                    self._count('timeouts')
+                    raise DeadlineExceeded(url)
+                break
+            if next_at is not None and time.monotonic() >= next_at:
+                if self._take_token(url):
+                    self._count(next_kind)
+                    launch()
+                else:
+                    next_at, next_kind = None, None
+        breaker.record_failure()
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+
+def breakers_from_env():
+    return CircuitBreakers(
+        failure_rate=float(os.environ.get('BREAKER_FAILURE_RATE', '0.5')),
+        window=int(os.environ.get('BREAKER_WINDOW', '20')),
+        reset_timeout=float(os.environ.get('BREAKER_RESET_SECONDS', '15')),
+    )
+
+
+def policy_from_env(prefix='HTTP', rate_limiter=None):
+    # Settings from {prefix}_HEDGE_AFTER (empty: no hedging), {prefix}_ATTEMPTS,
+    # {prefix}_BACKOFF, {prefix}_CONNECT_TIMEOUT and {prefix}_READ_TIMEOUT
+    hedge_after = os.environ.get(f'{prefix}_HEDGE_AFTER', '0.75')
+    return RequestPolicy(
+        breakers_from_env(),
+        hedge_after=float(hedge_after) if hedge_after else None,
+        attempts=int(os.environ.get(f'{prefix}_ATTEMPTS', '3')),
+        connect_timeout=float(os.environ.get(f'{prefix}_CONNECT_TIMEOUT', '2.0')),
+        read_timeout=float(os.environ.get(f'{prefix}_READ_TIMEOUT', '5.0')),
+        backoff=float(os.environ.get(f'{prefix}_BACKOFF', '0.1')),
+        rate_limiter=rate_limiter,
+    )
@@ -0,0 +1,80 @@
+"""Request coalescing: concurrent misses for one key make one upstream call.
+
+Within a process, callers for a key that is already in flight wait for the
+leader's result. Across Lambda execution environments the leader also takes a
+short lease in the cache's durable store; environments that lose the race
+poll the cache for the winner's result for a bounded time (and no longer than
+the caller's deadline allows) instead of calling upstream themselves.
+"""
+import threading
+import time
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """`fn` passed to `do` must store its result in `cache` and return it."""
+
+    def __init__(self, cache=None, lease_ttl=10.0, wait=3.0, poll_interval=0.1):
+        self.cache = cache
+        self.lease_ttl = lease_ttl
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'leaders': 0, 'coalesced': 0, 'remote_waits': 0}
+
+    def do(self, key, fn, deadline=None):
+        # `deadline` (a resilience.Deadline) caps the wait for another environment
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['leaders'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, deadline)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _lead(self, key, fn, deadline=None):
+        if self.cache is None or self.cache.acquire_lease(key, self.lease_ttl):
+            try:
+                return fn()
+            finally:
+                if self.cache is not None:
+                    self.cache.release_lease(key)
+
+        # Another environment holds the lease: wait for its result to land
+        with self._lock:
+            self.stats['remote_waits'] += 1
+        wait = self.wait if deadline is None else min(self.wait, deadline.remaining())
+        until = time.monotonic() + wait
+        while time.monotonic() < until:
+            time.sleep(min(self.poll_interval, max(0.0, until - time.monotonic())))
+            value = self.cache.peek(key)
+            if value is not None:
+                return value
+        return fn()
@@ -1,119 +1,51 @@
-import json
-import urllib3
+import logging
+
+from weather_common.action_group import ActionGroupRequest
+from weather_common.geocoding import UNAVAILABLE_MESSAGE, geocode_city
+from weather_common.http_cache import upstream_unavailable
+from weather_common.metrics import Timings, emit
+from weather_common.resilience import request_deadline
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
 
 def lambda_handler(event, context):
+    request = ActionGroupRequest.from_event(event)
+    timings = Timings()
+    deadline = request_deadline(context)
     try:
-        # Extract necessary details from the event
-        parameters = event.get('parameters', [])
-        
-        # Extract the city parameter from the event parameters
-        city = None
-        for param in parameters:
-            if param['name'] == 'city':
-                city = param['value']
-                break
-        
+        city = request.get('city')
+
         if not city:
-            response_body = {
-                'TEXT': {
-                    'body': "The 'city' parameter is missing. Please provide a valid city name."
-                }
-            }
-            
-            function_response = {
-                'actionGroup': event['actionGroup'],
-                'function': event['function'],
-                'functionResponse': {
-                    'responseState': 'REPROMPT',
-                    'responseBody': response_body
-                }
-            }
-            
-            return {
-                'messageVersion': '1.0',
-                'response': function_response,
-                'sessionAttributes': event.get('sessionAttributes', {}),
-                'promptSessionAttributes': event.get('promptSessionAttributes', {})
-            }
+            return request.reprompt("The 'city' parameter is missing. Please provide a valid city name.")
 
-        # Use OpenStreetMap Nominatim API to convert city name to latitude and longitude
-        geocode_url = f'https://nominatim.openstreetmap.org/search?q={city}&format=json&limit=1'
-        http = urllib3.PoolManager()
-        geocode_response = http.request('GET', geocode_url)
-        geocode_data = json.loads(geocode_response.data.decode('utf-8'))
+        # Convert city name to latitude and longitude (gazetteer, then OpenStreetMap Nominatim)
+        with timings.measure('geocode'):
+            geocode_data = geocode_city(city, deadline)
+        emit('geocode_city', timings.ms, {
+            'found': bool(geocode_data),
+            'geocode_source': geocode_data[0].get('source', 'nominatim') if geocode_data else None,
+        })
 
         if not geocode_data:
-            response_body = {
-                'TEXT': {
-                    'body': f"Could not find location data for the city: {city}."
-                }
-            }
-            
-            function_response = {
-                'actionGroup': event['actionGroup'],
-                'function': event['function'],
-                'functionResponse': {
-                    'responseState': 'FAILURE',
-                    'responseBody': response_body
-                }
-            }
-            
-            return {
-                'messageVersion': '1.0',
-                'response': function_response,
-                'sessionAttributes': event.get('sessionAttributes', {}),
-                'promptSessionAttributes': event.get('promptSessionAttributes', {})
-            }
+            return request.failure(f"Could not find location data for the city: {city}.")
 
         latitude = geocode_data[0]['lat']
         longitude = geocode_data[0]['lon']
 
-        # Store the latitude and longitude in session attributes
-        session_attributes = event.get('sessionAttributes', {})
-        session_attributes['latitude'] = latitude
-        session_attributes['longitude'] = longitude
+        # Store the city and its coordinates in session attributes; get_weather
+        # only reuses the coordinates for the same city
+        request.session_attributes['city'] = city
+        request.session_attributes['latitude'] = latitude
+        request.session_attributes['longitude'] = longitude
 
-        response_body = {
-            'TEXT': {
-                'body': f"Retrieved coordinates: Latitude {latitude}, Longitude {longitude} for {city}."
-            }
-        }
-        
-        function_response = {
-            'actionGroup': event['actionGroup'],
-            'function': event['function'],
-            'functionResponse': {
-                'responseState': 'REPROMPT',  # Still using REPROMPT since Bedrock expects this.
-                'responseBody': response_body
-            }
-        }
-        
-        return {
-            'messageVersion': '1.0',
-            'response': function_response,
-            'sessionAttributes': session_attributes,
-            'promptSessionAttributes': event.get('promptSessionAttributes', {})
-        }
+        # Still using REPROMPT since Bedrock expects this.
+        return request.reprompt(f"Retrieved coordinates: Latitude {latitude}, Longitude {longitude} for {city}.")
 
     except Exception as e:
-        response_body = {
-            'TEXT': {
-                'body': f"An error occurred: {str(e)}"
-            }
-        }
-        
-        function_response = {
-            'actionGroup': event['actionGroup'],
-            'function': event['function'],
-            'functionResponse': {
-                'responseState': 'FAILURE',
-                'responseBody': response_body
-            }
-        }
-        
-        return {
-            'messageVersion': '1.0',
-            'response': function_response,
-            'sessionAttributes': event.get('sessionAttributes', {}),
-            'promptSessionAttributes': event.get('promptSessionAttributes', {})
-        }
\ No newline at end of file
+        if upstream_unavailable(e):
+            logger.warning('Nominatim unavailable: %s', e)
+            return request.failure(UNAVAILABLE_MESSAGE)
+        logger.exception('Unexpected error')
+        return request.failure("An error occurred while looking up the city. Please try again.")
@@ -0,0 +1,63 @@
+import logging
+
+from weather_common import noaa
+from weather_common.action_group import ActionGroupRequest, dumps
+from weather_common.geocoding import UNAVAILABLE_MESSAGE, geocode_city
+from weather_common.http_cache import upstream_unavailable
+from weather_common.metrics import Timings, emit
+from weather_common.resilience import request_deadline
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+# Single action-group function: geocode the city and fetch its forecast in
+# one invocation, saving the agent a second orchestration step
+def lambda_handler(event, context):
+    request = ActionGroupRequest.from_event(event)
+    timings = Timings()
+    # Geocoding counts against the same budget as the forecast
+    deadline = request_deadline(context)
+    try:
+        city = request.get('city')
+
+        if not city:
+            return request.reprompt("The 'city' parameter is missing. Please provide a valid city name.")
+
+        with timings.measure('geocode'):
+            geocode_data = geocode_city(city, deadline)
+
+        if not geocode_data:
+            return request.failure(f"Could not find location data for the city: {city}.")
+
+        latitude = geocode_data[0]['lat']
+        longitude = geocode_data[0]['lon']
+
+        # Keep the coordinates in the session so the two-step get_weather
+        # function still works for follow-up questions
+        request.session_attributes['city'] = city
+        request.session_attributes['latitude'] = latitude
+        request.session_attributes['longitude'] = longitude
+
+        forecast = noaa.build_forecast(latitude, longitude, city, timings=timings, deadline=deadline)
+        if geocode_data[0].get('match'):
+            forecast['location']['match'] = geocode_data[0]['match']
+        emit('get_city_weather', timings.ms, {
+            'geocode_source': geocode_data[0].get('source', 'nominatim'),
+            'stale_seconds': forecast.get('stale', {}).get('age_seconds'),
+            'forecast_cache': noaa.forecast_cache.stats,
+            'rate_limiter': noaa.rate_limiter.stats,
+            'upstream': noaa.policy.stats,
+        })
+
+        return request.reprompt(dumps(forecast))
+
+    except noaa.ForecastUnavailable as e:
+        logger.warning('NOAA unavailable: %s', e.reason)
+        return request.failure(str(e))
+    except Exception as e:
+        if upstream_unavailable(e):
+            logger.warning('Nominatim unavailable: %s', e)
+            return request.failure(UNAVAILABLE_MESSAGE)
+        logger.exception('Unexpected error')
+        return request.failure("An error occurred while getting the forecast. Please try again.")
@@ -1,97 +1,166 @@
-import json
-import urllib3
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from weather_common import noaa
+from weather_common.action_group import ActionGroupRequest, BodyWriter, dumps, loads
+from weather_common.gazetteer import default_gazetteer, normalize
+from weather_common.geocoding import UNAVAILABLE_MESSAGE, geocode_city
+from weather_common.http_cache import upstream_unavailable
+from weather_common.metrics import Timings, emit
+from weather_common.resilience import request_deadline
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Multi-location requests fan out over this pool; the NOAA connection pool is
+# sized to match so concurrent fetches reuse connections instead of opening more
+MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '8'))
+MAX_LOCATIONS = int(os.environ.get('BATCH_MAX_LOCATIONS', '10'))
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+
+def names_one_place(gazetteer, name, qualifier):
+    # Whether "<name>, <qualifier>" is a place ("Portland, OR") rather than two
+    # ("Boston, SF"); only the gazetteer can tell, so without it they stay apart
+    if gazetteer is None or ',' in name:
+        return False
+    place = gazetteer.lookup(f'{name}, {qualifier}')
+    return place is not None and place['match'] == 'exact'
+
+
+def split_places(piece, gazetteer=None):
+    # "Boston, NYC, DC" -> three places, but "Portland, OR" is one, and so is
+    # each city in "Portland, OR, Seattle, WA"
+    places = []
+    for part in (p.strip() for p in piece.split(',')):
+        if places and names_one_place(gazetteer, places[-1], part):
+            places[-1] = f'{places[-1]}, {part}'
+        else:
+            places.append(part)
+    return places
+
+
+def parse_locations(value):
+    # A JSON array of city names or {"city", "latitude", "longitude"} objects,
+    # or a plain list such as "Boston; New York" or "Portland, OR and Seattle, WA"
+    value = value.strip()
+    if value.startswith('['):
+        items = loads(value)
+    elif ';' in value:
+        items = [part.strip() for part in value.split(';')]
+    else:
+        gazetteer = default_gazetteer()
+        items = [place for piece in re.split(r'\band\b', value, flags=re.IGNORECASE)
+                 for place in split_places(piece, gazetteer)]
+    locations = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'city': item}
+        if item.get('city') or (item.get('latitude') and item.get('longitude')):
+            locations.append(item)
+    return locations
+
+
+def forecast_for(location, deadline=None):
+    latitude, longitude = location.get('latitude'), location.get('longitude')
+    if not latitude or not longitude:
+        geocode_data = geocode_city(location['city'], deadline)
+        if not geocode_data:
+            raise LookupError(f"Could not find location data for the city: {location['city']}.")
+        latitude, longitude = geocode_data[0]['lat'], geocode_data[0]['lon']
+    # Daily periods only: hourly data for every city would crowd the response
+    return noaa.build_forecast(latitude, longitude, location.get('city'), hourly=False, deadline=deadline)
+
+
+def describe_error(error):
+    # A message for the agent; raw exception text stays in the logs
+    if isinstance(error, (LookupError, noaa.ForecastUnavailable)):
+        return str(error)
+    if upstream_unavailable(error):
+        return UNAVAILABLE_MESSAGE
+    logger.error('Forecast failed', exc_info=error)
+    return "An error occurred while getting this forecast."
+
+
+def forecast_many(locations, pool=None, deadline=None):
+    # Fetch every location concurrently; failures are reported per item so
+    # one bad city does not fail the whole request. Results are forecast
+    # payloads, or {"schema_version", "location", "error"}
+    futures = [(location, (pool or executor).submit(forecast_for, location, deadline)) for location in locations]
+    results = []
+    for location, future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append({'schema_version': noaa.SCHEMA_VERSION, 'location': location, 'error': describe_error(e)})
+    return results
+
 
 def lambda_handler(event, context):
+    request = ActionGroupRequest.from_event(event)
+    timings = Timings()
+    deadline = request_deadline(context)
     try:
-        # Extract necessary details from the event
-        session_attributes = event.get('sessionAttributes', {})
-        parameters = event.get('parameters', [])
-
-        city = None
-        latitude = session_attributes.get('latitude', None)
-        longitude = session_attributes.get('longitude', None)
-
-        for param in parameters:
-            if param['name'] == 'city':
-                city = param['value']
-
-        if not city or not latitude or not longitude:
-            response_body = {
-                'TEXT': {
-                    'body': "Missing required parameters: city, latitude, or longitude."
-                }
-            }
-            
-            function_response = {
-                'actionGroup': event['actionGroup'],
-                'function': event['function'],
-                'functionResponse': {
-                    'responseState': 'REPROMPT',
-                    'responseBody': response_body
-                }
-            }
-            
-            return {
-                'messageVersion': '1.0',
-                'response': function_response,
-                'sessionAttributes': session_attributes,
-                'promptSessionAttributes': event.get('promptSessionAttributes', {})
-            }
-
-        # NOAA Weather API call to get the weather data
-        api_url = f'https://api.weather.gov/points/{latitude},{longitude}'
-        http = urllib3.PoolManager()
-        response = http.request('GET', api_url)
-        data = json.loads(response.data.decode('utf-8'))
-
-        # Extract the forecast URL
-        forecast_url = data['properties']['forecast']
-        forecast_response = http.request('GET', forecast_url)
-        forecast_data = json.loads(forecast_response.data.decode('utf-8'))
-
-        forecast_summary = forecast_data['properties']['periods'][0]['detailedForecast']
-
-        response_body = {
-            'TEXT': {
-                'body': f"The weather in {city} (Lat: {latitude}, Lon: {longitude}) is: {forecast_summary}"
-            }
-        }
-        
-        function_response = {
-            'actionGroup': event['actionGroup'],
-            'function': event['function'],
-            'functionResponse': {
-                'responseState': 'REPROMPT',
-                'responseBody': response_body
-            }
-        }
-        
-        return {
-            'messageVersion': '1.0',
-            'response': function_response,
-            'sessionAttributes': session_attributes,
-            'promptSessionAttributes': event.get('promptSessionAttributes', {})
-        }
-
-    except Exception as e:
-        response_body = {
-            'TEXT': {
-                'body': f"An error occurred: {str(e)}"
-            }
-        }
-        
-        function_response = {
-            'actionGroup': event['actionGroup'],
-            'function': event['function'],
-            'functionResponse': {
-                'responseState': 'FAILURE',
-                'responseBody': response_body
-            }
-        }
-        
-        return {
-            'messageVersion': '1.0',
-            'response': function_response,
-            'sessionAttributes': session_attributes,
-            'promptSessionAttributes': event.get('promptSessionAttributes', {})
-        }
\ No newline at end of file
+        session_attributes = request.session_attributes
+        city = request.get('city')
+
+        locations = request.get('locations') or request.get('cities')
+        if locations:
+            locations = parse_locations(locations)
+            # Locations past the limit are reported rather than silently dropped
+            locations, skipped = locations[:MAX_LOCATIONS], locations[MAX_LOCATIONS:]
+            with timings.measure('forecast_many'):
+                results = forecast_many(locations, deadline=deadline)
+            results.extend({'schema_version': noaa.SCHEMA_VERSION, 'location': location,
+                            'error': f'Not fetched: at most {MAX_LOCATIONS} locations per request.'}
+                           for location in skipped)
+            emit('get_weather', timings.ms, {
+                'locations': len(locations),
+                'forecast_cache': noaa.forecast_cache.stats,
+                'rate_limiter': noaa.rate_limiter.stats,
+                'upstream': noaa.policy.stats,
+            })
+
+            # One JSON payload per line, so truncation only ever drops whole locations
+            body = BodyWriter()
+            body.writelines(dumps(result) for result in results)
+            return request.reprompt(body)
+
+        if not city:
+            return request.reprompt("The 'city' parameter is missing. Please provide a valid city name.")
+
+        # The session outlives a single question, so its coordinates may belong
+        # to an earlier city; only use them for the city they were resolved for
+        latitude = longitude = None
+        if normalize(session_attributes.get('city') or '') == normalize(city):
+            latitude = session_attributes.get('latitude')
+            longitude = session_attributes.get('longitude')
+        if not latitude or not longitude:
+            with timings.measure('geocode'):
+                geocode_data = geocode_city(city, deadline)
+            if not geocode_data:
+                return request.failure(f"Could not find location data for the city: {city}.")
+            latitude, longitude = geocode_data[0]['lat'], geocode_data[0]['lon']
+            session_attributes['city'] = city
+            session_attributes['latitude'] = latitude
+            session_attributes['longitude'] = longitude
+
+        # Resolve the gridpoint and its forecast, both served from cache when possible
+        forecast = noaa.build_forecast(latitude, longitude, city, timings=timings, deadline=deadline)
+        emit('get_weather', timings.ms, {
+            'stale_seconds': forecast.get('stale', {}).get('age_seconds'),
+            'forecast_cache': noaa.forecast_cache.stats,
+            'rate_limiter': noaa.rate_limiter.stats,
+            'upstream': noaa.policy.stats,
+        })
+
+        return request.reprompt(dumps(forecast))
+
+    except noaa.ForecastUnavailable as e:
+        logger.warning('NOAA unavailable: %s', e.reason)
+        return request.failure(str(e))
+    except Exception:
+        logger.exception('Unexpected error')
+        return request.failure("An error occurred while getting the forecast. Please try again.")
@@ -4,9 +4,12 @@ from aws_cdk import (
     aws_ecs as ecs,
     aws_ecr_assets as ecr_assets,
     aws_lambda as _lambda,
+    aws_dynamodb as dynamodb,
     aws_iam as iam,
     aws_elasticloadbalancingv2 as elbv2,
-    CfnOutput
+    BundlingOptions,
+    CfnOutput,
+    RemovalPolicy
 )
 from constructs import Construct
 
@@ -21,20 +24,64 @@ class CdkBedrockAgentsWeatherAppStack(Stack):
         # Create VPC
         vpc = ec2.Vpc(self, "WeatherAppVPC", max_azs=2)
 
+        # Durable cache shared by every Lambda execution environment
+        cache_table = dynamodb.Table(
+            self, 'WeatherCacheTable',
+            partition_key=dynamodb.Attribute(name='pk', type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute='expires_at',
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        # Layer with the code shared by the Lambda functions, plus its
+        # optional dependencies (orjson) installed for the Lambda runtime
+        common_layer = _lambda.LayerVersion(
+            self, 'WeatherCommonLayer',
+            code=_lambda.Code.from_asset(
+                'lambda_functions/common',
+                bundling=BundlingOptions(
+                    image=_lambda.Runtime.PYTHON_3_9.bundling_image,
+                    command=[
+                        'bash', '-c',
+                        'pip install -r requirements.txt -t /asset-output/python && '
+                        'cp -au python/. /asset-output/python',
+                    ],
+                ),
+            ),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_9],
+        )
+
         # Define Lambda functions
         get_weather_lambda = _lambda.Function(
             self, 'GetWeatherLambda',
             runtime=_lambda.Runtime.PYTHON_3_9,
             handler='NOAA_API_Weather_Lambda.lambda_handler',
             code=_lambda.Code.from_asset('lambda_functions/get_weather'),
+            layers=[common_layer],
+            environment={'CACHE_TABLE_NAME': cache_table.table_name},
         )
+        cache_table.grant_read_write_data(get_weather_lambda)
 
         geocode_city_lambda = _lambda.Function(
             self, 'GeocodeCityLambda',
             runtime=_lambda.Runtime.PYTHON_3_9,
             handler='OpenStreamMapAPI_Lambda.lambda_handler',
             code=_lambda.Code.from_asset('lambda_functions/geocode_city'),
+            layers=[common_layer],
+            environment={'CACHE_TABLE_NAME': cache_table.table_name},
+        )
+        cache_table.grant_read_write_data(geocode_city_lambda)
+
+        # Combined geocode + forecast function, one agent step instead of two
+        get_city_weather_lambda = _lambda.Function(
+            self, 'GetCityWeatherLambda',
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler='City_Weather_Lambda.lambda_handler',
+            code=_lambda.Code.from_asset('lambda_functions/get_city_weather'),
+            layers=[common_layer],
+            environment={'CACHE_TABLE_NAME': cache_table.table_name},
         )
+        cache_table.grant_read_write_data(get_city_weather_lambda)
 
         if deployment_type == 'EC2':
             # EC2 Deployment
@@ -57,8 +104,14 @@ class CdkBedrockAgentsWeatherAppStack(Stack):
                 "yum install -y python3 python3-pip",
                 "pip3 install streamlit geopy folium streamlit-folium boto3",
                 "aws s3 cp s3://your-bucket/streamlit_app/weather_app.py /home/ec2-user/weather_app.py",
+                f"WEATHER_FUNCTION_NAME={get_city_weather_lambda.function_name} "
+                f"RESPONSE_CACHE_TABLE={cache_table.table_name} "
                 "streamlit run /home/ec2-user/weather_app.py --server.port 8501 --server.address 0.0.0.0"
             )
+            # Plain weather questions call the weather function directly, and
+            # their answers are shared through the cache table
+            get_city_weather_lambda.grant_invoke(instance)
+            cache_table.grant_read_write_data(instance)
 
             CfnOutput(self, "AppURL",
                       value=f"http://{instance.instance_public_dns_name}:8501",
@@ -78,7 +131,15 @@ class CdkBedrockAgentsWeatherAppStack(Stack):
                 "WeatherAppContainer",
                 image=ecs.ContainerImage.from_asset("streamlit_app"),
                 port_mappings=[ecs.PortMapping(container_port=8501)],
+                # Plain weather questions call the weather function directly, and
+                # their answers are shared through the cache table
+                environment={
+                    'WEATHER_FUNCTION_NAME': get_city_weather_lambda.function_name,
+                    'RESPONSE_CACHE_TABLE': cache_table.table_name,
+                },
             )
+            get_city_weather_lambda.grant_invoke(task_definition.task_role)
+            cache_table.grant_read_write_data(task_definition.task_role)
 
             service = ecs.FargateService(
                 self, "WeatherAppService",
@@ -115,3 +176,4 @@ class CdkBedrockAgentsWeatherAppStack(Stack):
         # Output Lambda ARNs for use in Bedrock Agent setup
         CfnOutput(self, "GetWeatherLambdaArn", value=get_weather_lambda.function_arn)
         CfnOutput(self, "GeocodeCityLambdaArn", value=geocode_city_lambda.function_arn)
+        CfnOutput(self, "GetCityWeatherLambdaArn", value=get_city_weather_lambda.function_arn)
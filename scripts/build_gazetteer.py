@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Compile a GeoNames cities dump into the gazetteer index used by the
+geocode Lambda.
+
+    python scripts/build_gazetteer.py                      # downloads cities15000
+    python scripts/build_gazetteer.py cities15000.zip --admin1 admin1CodesASCII.txt
+
+The index is written into the shared Lambda layer
+(lambda_functions/common/python/weather_common/data/gazetteer.sqlite) unless
+--output is given. GeoNames data is licensed CC BY 4.0.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import urllib.request
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'lambda_functions', 'common', 'python'))
+
+from weather_common.gazetteer import DEFAULT_PATH, build_index, read_admin1_names, read_geonames  # noqa: E402
+
+GEONAMES_URL = 'https://download.geonames.org/export/dump/'
+
+
+def open_lines(path):
+    # Plain text, or the single .txt member of a GeoNames zip
+    if path.endswith('.zip'):
+        archive = zipfile.ZipFile(path)
+        member = next(n for n in archive.namelist() if n.endswith('.txt'))
+        return io.TextIOWrapper(archive.open(member), encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def download(name, directory):
+    target = os.path.join(directory, name)
+    print(f'Downloading {GEONAMES_URL}{name}')
+    urllib.request.urlretrieve(GEONAMES_URL + name, target)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('cities', nargs='?',
+                        help='GeoNames cities file (.txt or .zip); downloaded when omitted')
+    parser.add_argument('--admin1', help='admin1CodesASCII.txt, enables "City, State name" queries')
+    parser.add_argument('--dataset', default='cities15000.zip',
+                        help='GeoNames file to download when no input is given')
+    parser.add_argument('--min-population', type=int, default=0)
+    parser.add_argument('--alternate-names', action='store_true',
+                        help='also index alternate names (larger index)')
+    parser.add_argument('--output', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cities = args.cities or download(args.dataset, tmp)
+        admin1 = args.admin1
+        if admin1 is None and args.cities is None:
+            admin1 = download('admin1CodesASCII.txt', tmp)
+
+        admin1_names = {}
+        if admin1:
+            with open_lines(admin1) as lines:
+                admin1_names = read_admin1_names(lines)
+
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open_lines(cities) as lines:
+            records = (
+                r for r in read_geonames(lines, admin1_names, args.alternate_names)
+                if r[7] >= args.min_population
+            )
+            count = build_index(records, args.output)
+
+    size = os.path.getsize(args.output)
+    print(f'Wrote {count} names to {args.output} ({size / 1024 / 1024:.1f} MiB)')
+
+
+if __name__ == '__main__':
+    main()
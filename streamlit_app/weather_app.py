@@ -1,110 +1,914 @@
 import streamlit as st
 import folium  # For generating maps
-from streamlit_folium import st_folium  # To display maps in Streamlit
-from geopy.geocoders import Nominatim  # For geocoding (converting city to lat/lon)
+import streamlit.components.v1 as components  # To display the rendered maps
+from geopy.geocoders import Nominatim  # For geocoding (converting city to lat/lon), only as a fallback
 import boto3  # For AWS Bedrock connection
+from botocore.config import Config  # For tuning the shared AWS clients
 import json  # For handling JSON responses
+import os  # For configuration from the environment
 import uuid  # For generating unique session IDs
+import codecs  # For incremental UTF-8 decoding of streamed chunks
+import time  # For response timing
+from datetime import datetime, timedelta  # For picking forecast periods
+import threading  # For the process-wide agent session store
+import queue  # For handing agent chunks from worker threads to the script
+from concurrent.futures import ThreadPoolExecutor  # For running agent calls off the script thread
+import re  # For reading coordinates out of action group results
+import zlib  # For compressing older chat turns
+from collections import OrderedDict, deque  # For the bounded chat history and the answer cache
 from streamlit_chat import message  # For chatbot messages
 
-# Set up Bedrock client for LLM
-def get_bedrock_client():
+# How many agent calls run at once on this server (see AgentInvoker)
+AGENT_MAX_CONCURRENCY = int(os.environ.get('AGENT_MAX_CONCURRENCY', '8'))
+
+# Settings for the AWS clients, which are shared by every session on this server.
+# Agent calls run on AGENT_MAX_CONCURRENCY worker threads, so the Bedrock connection
+# pool is sized for that many streams. The read timeout applies between streamed
+# chunks, and the agent can take a while to orchestrate before its first chunk.
+BEDROCK_CLIENT_CONFIG = Config(
+    max_pool_connections=AGENT_MAX_CONCURRENCY,
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=120,
+    retries={'max_attempts': 4, 'mode': 'adaptive'},
+)
+
+# The weather Lambda (3 s timeout, plus a cold start) and the response cache table
+# are called from the sessions' script threads while the user waits. A stalled call
+# gives up quickly so the question falls through to the agent or skips the cache.
+LAMBDA_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    connect_timeout=2,
+    read_timeout=10,
+    retries={'max_attempts': 2, 'mode': 'standard'},
+)
+DYNAMODB_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    connect_timeout=1,
+    read_timeout=2,
+    retries={'max_attempts': 2, 'mode': 'standard'},
+)
+
+# One boto3 session for the process. Sessions are not thread-safe, so it is only
+# used through make_client, which creates the clients below (they are thread-safe)
+# under one lock: each cached function has its own lock, so theirs are not enough.
+SESSION_LOCK = threading.Lock()
+
+@st.cache_resource
+def get_boto3_session():
     if "aws_credentials" not in st.secrets:
         raise ValueError("AWS credentials not found in Streamlit secrets")
-    
-    session = boto3.Session(
+
+    return boto3.Session(
         aws_access_key_id=st.secrets.aws_credentials.AWS_ACCESS_KEY_ID,
         aws_secret_access_key=st.secrets.aws_credentials.AWS_SECRET_ACCESS_KEY,
         region_name=st.secrets.aws_credentials.AWS_DEFAULT_REGION
     )
-    bedrock_client = session.client('bedrock-runtime')
-    return bedrock_client
+
+def make_client(service_name, config=BEDROCK_CLIENT_CONFIG):
+    with SESSION_LOCK:
+        return get_boto3_session().client(service_name, config=config)
+
+# Set up Bedrock client for LLM
+@st.cache_resource
+def get_bedrock_client():
+    return make_client('bedrock-runtime')
 
 # Set up Bedrock client for Agent
+@st.cache_resource
 def get_bedrock_agent_client():
-    if "aws_credentials" not in st.secrets:
-        raise ValueError("AWS credentials not found in Streamlit secrets")
-    
-    session = boto3.Session(
-        aws_access_key_id=st.secrets.aws_credentials.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=st.secrets.aws_credentials.AWS_SECRET_ACCESS_KEY,
-        region_name=st.secrets.aws_credentials.AWS_DEFAULT_REGION
+    return make_client('bedrock-agent-runtime')
+
+# Lambda client for the weather fast path
+@st.cache_resource
+def get_lambda_client():
+    return make_client('lambda', LAMBDA_CLIENT_CONFIG)
+
+# How long an agent session survives without messages; match the agent's idle session TTL
+AGENT_SESSION_IDLE_SECONDS = 30 * 60
+
+# Process-wide store of agent sessions keyed by conversation, so a conversation
+# keeps its agent session (and session attributes) across page reloads
+class AgentSessionStore:
+    def __init__(self, idle_seconds=AGENT_SESSION_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            # Drop idle sessions so the store does not grow without bound
+            for stale in [k for k, v in self._sessions.items() if now - v['last_used'] > self.idle_seconds]:
+                del self._sessions[stale]
+            session = self._sessions.get(key)
+            if session is not None:
+                session['last_used'] = now
+            return session
+
+    def put(self, key, session):
+        with self._lock:
+            session['last_used'] = time.time()
+            self._sessions[key] = session
+
+@st.cache_resource
+def get_agent_session_store():
+    return AgentSessionStore()
+
+def new_agent_session():
+    return {'session_id': str(uuid.uuid4()), 'attributes': {}, 'last_used': time.time()}
+
+# The agent session for this conversation, tied to st.session_state and kept
+# server-side under the ?conversation= query parameter
+def get_agent_session():
+    store = get_agent_session_store()
+    key = st.query_params.get('conversation')
+    if not key:
+        key = uuid.uuid4().hex
+        st.query_params['conversation'] = key
+
+    session = st.session_state.get('agent_session')
+    if session is None or st.session_state.get('conversation_key') != key:
+        session = store.get(key)
+    if session is None or time.time() - session['last_used'] > AGENT_SESSION_IDLE_SECONDS:
+        session = new_agent_session()
+    store.put(key, session)
+    st.session_state['agent_session'] = session
+    st.session_state['conversation_key'] = key
+    return session
+
+# Per-session chat history limits. The latest turns are kept as-is; older ones
+# are compressed and only unpacked when the user pages back to them. Once a
+# session's history exceeds its memory budget the oldest turns are dropped, so
+# one long conversation cannot squeeze the others in the (512 MiB) Fargate task.
+CHAT_RECENT_TURNS = 20
+CHAT_PAGE_SIZE = 10
+CHAT_MEMORY_BUDGET_BYTES = 2 * 1024 * 1024
+
+# Bounded chat history. Turns are numbered from 0 for the whole conversation,
+# so the number is a stable widget key even after older turns are dropped.
+class ChatHistory:
+    def __init__(self, recent_turns=CHAT_RECENT_TURNS, max_bytes=CHAT_MEMORY_BUDGET_BYTES):
+        self.recent_turns = recent_turns
+        self.max_bytes = max_bytes
+        self._recent = deque()   # (number, turn, size)
+        self._archive = deque()  # (number, compressed turn)
+        self._size = 0
+        self.total = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._archive) + len(self._recent)
+
+    @property
+    def size(self):
+        # Approximate bytes held by this history
+        return self._size
+
+    def append(self, turn):
+        size = sum(len(str(value).encode('utf-8')) for value in turn.values()) + 200
+        self._recent.append((self.total, turn, size))
+        self._size += size
+        self.total += 1
+        while len(self._recent) > self.recent_turns:
+            number, old, old_size = self._recent.popleft()
+            packed = zlib.compress(json.dumps(old).encode('utf-8'))
+            self._archive.append((number, packed))
+            self._size += len(packed) - old_size
+        while self._size > self.max_bytes and len(self) > 1:
+            if self._archive:
+                self._size -= len(self._archive.popleft()[1])
+            else:
+                self._size -= self._recent.popleft()[2]
+            self.dropped += 1
+
+    def window(self, count):
+        # The latest `count` turns as (number, turn), oldest first
+        turns = [(number, turn) for number, turn, _ in list(self._recent)[-count:]]
+        missing = count - len(turns)
+        if missing > 0 and self._archive:
+            archived = list(self._archive)[-missing:]
+            turns[:0] = [(number, json.loads(zlib.decompress(packed))) for number, packed in archived]
+        return turns
+
+def get_chat_history():
+    if 'chat_history' not in st.session_state:
+        st.session_state['chat_history'] = ChatHistory()
+    return st.session_state['chat_history']
+
+def load_older_messages():
+    st.session_state['chat_visible'] = st.session_state.get('chat_visible', CHAT_PAGE_SIZE) + CHAT_PAGE_SIZE
+
+# Render the visible part of the chat history, newest last, with a control to page in older turns
+def display_chat_history(history):
+    visible = st.session_state.setdefault('chat_visible', CHAT_PAGE_SIZE)
+    if len(history) > visible:
+        st.button(f"Load older messages ({len(history) - visible} more)", on_click=load_older_messages)
+    if history.dropped and len(history) <= visible:
+        st.caption(f"{history.dropped} earlier messages were removed to keep this conversation within its memory limit.")
+    for number, chat in history.window(visible):
+        message(chat['user'], is_user=True, key=f"user_{number}")
+        message(chat['bot'], is_user=False, key=f"bot_{number}")
+        timings = chat.get('timings') or {}
+        if timings.get('cached'):
+            st.caption(f"Cached answer · saved {timings['saved']:.2f}s")
+        elif 'total' in timings:
+            queued = f" · queued {timings['queued']:.2f}s" if timings.get('queued', 0) >= 0.05 else ""
+            st.caption(f"First token {timings.get('ttft', timings['total']):.2f}s · total {timings['total']:.2f}s{queued}")
+
+# Remember a resolved location in the agent session so follow-up questions
+# ("and tomorrow?") can skip geocoding
+def remember_location(session, city, latitude, longitude):
+    session['attributes'].update({
+        'city': str(city),
+        'latitude': str(latitude),
+        'longitude': str(longitude),
+    })
+
+# Stream the Bedrock Agent's answer as text chunks as they arrive.
+# If `timings` is given, time-to-first-token and total time (seconds) are recorded in it.
+# With an agent `session` the conversation continues and its attributes are sent along.
+# If `observations` is given, the action group results seen in the trace are appended to it.
+# Setting the `cancelled` event stops reading and closes the stream, even between trace events.
+def stream_bedrock_agent(agent_id, input_text, bedrock_agent_client, timings=None, session=None, observations=None,
+                         cancelled=None):
+    start = time.perf_counter()
+    if session is None:
+        session = new_agent_session()
+
+    request = dict(
+        agentId=agent_id,
+        agentAliasId='380YCVUBPD',  # Alias ID from your settings
+        sessionId=session['session_id'],
+        inputText=input_text,
+        enableTrace=True  # Optional but recommended for debugging
     )
-    bedrock_agent_client = session.client('bedrock-agent-runtime')
-    return bedrock_agent_client
+    if session['attributes']:
+        request['sessionState'] = {'sessionAttributes': dict(session['attributes'])}
+    response_stream = bedrock_agent_client.invoke_agent(**request)
 
-# Function to invoke Bedrock Agent (for weather data)
-def invoke_bedrock_agent(agent_id, input_text, bedrock_agent_client):
+    # Chunks can split multi-byte characters, so decode incrementally
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    completion = response_stream['completion']
     try:
-        session_id = str(uuid.uuid4())  # Generate a new unique session ID
-
-        response_stream = bedrock_agent_client.invoke_agent(
-            agentId=agent_id,
-            agentAliasId='380YCVUBPD',  # Alias ID from your settings
-            sessionId=session_id,
-            inputText=input_text,
-            enableTrace=True  # Optional but recommended for debugging
-        )
+        yield from decode_completion(completion, decoder, start, timings, observations, cancelled)
+    finally:
+        # Closing the event stream releases the connection if the caller stopped early
+        close = getattr(completion, 'close', None)
+        if close is not None:
+            close()
+    if cancelled is not None and cancelled.is_set():
+        return
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+    if timings is not None:
+        timings['total'] = time.perf_counter() - start
 
-        # Initialize variable to collect the chunks from EventStream
-        full_response = ""
-
-        # Iterate over the EventStream
-        for event in response_stream['completion']:
-            if 'PayloadPart' in event:
-                part_data = event['PayloadPart'].get('bytesValue')
-                if part_data:
-                    full_response += part_data.decode('utf-8')
-            elif 'chunk' in event:
-                chunk_data = event['chunk'].get('bytes')
-                if chunk_data:
-                    full_response += chunk_data.decode('utf-8')
-        
-        # Parse the full response
-        if full_response:
-            return full_response
-        else:
-            return "No response from agent"
+def decode_completion(completion, decoder, start, timings, observations, cancelled=None):
+    for event in completion:
+        # Most of a call is trace events with no text, so check for cancellation on each
+        if cancelled is not None and cancelled.is_set():
+            return
+        data = None
+        if 'PayloadPart' in event:
+            data = event['PayloadPart'].get('bytesValue')
+        elif 'chunk' in event:
+            data = event['chunk'].get('bytes')
+        elif 'trace' in event:
+            trace = event['trace'].get('trace', {})
+            if timings is not None:
+                record_trace(timings, trace, time.perf_counter() - start)
+            if observations is not None:
+                observation = trace.get('orchestrationTrace', {}).get('observation', {})
+                output = observation.get('actionGroupInvocationOutput', {}).get('text')
+                if output:
+                    observations.append(output)
+        if data:
+            text = decoder.decode(data)
+            if text:
+                if timings is not None and 'ttft' not in timings:
+                    timings['ttft'] = time.perf_counter() - start
+                yield text
+
+# Trace parts that carry the agent's model calls and action group invocations
+TRACE_STAGES = {
+    'preProcessingTrace': 'pre-processing',
+    'orchestrationTrace': 'orchestration',
+    'postProcessingTrace': 'post-processing',
+}
+
+def _open_step(steps, kind):
+    for step in reversed(steps):
+        if step['step'] == kind and 'duration' not in step:
+            return step
+    return None
+
+def _finish_step(step, at, metadata):
+    total_ms = (metadata or {}).get('totalTimeMs')
+    step['duration'] = total_ms / 1000.0 if total_ms is not None else at - step['start']
+
+# Add one trace event, received `at` seconds into the request, to the timeline in
+# timings['steps']: model invocations (with token counts), action group calls and
+# the agent's rationale and final response
+def record_trace(timings, trace, at):
+    steps = timings.setdefault('steps', [])
+    for part_name, stage in TRACE_STAGES.items():
+        part = trace.get(part_name)
+        if not part:
+            continue
+        if 'modelInvocationInput' in part:
+            steps.append({'stage': stage, 'step': 'model', 'start': at})
+        elif 'modelInvocationOutput' in part:
+            metadata = part['modelInvocationOutput'].get('metadata') or {}
+            step = _open_step(steps, 'model')
+            if step is None:
+                step = {'stage': stage, 'step': 'model', 'start': at}
+                steps.append(step)
+            _finish_step(step, at, metadata)
+            usage = metadata.get('usage') or {}
+            step['input_tokens'] = usage.get('inputTokens')
+            step['output_tokens'] = usage.get('outputTokens')
+        elif 'invocationInput' in part:
+            invocation = part['invocationInput']
+            action = invocation.get('actionGroupInvocationInput') or {}
+            name = action.get('function') or action.get('apiPath') or invocation.get('invocationType')
+            steps.append({'stage': stage, 'step': 'action', 'name': name, 'start': at})
+        elif 'observation' in part:
+            observation = part['observation']
+            if 'actionGroupInvocationOutput' in observation:
+                step = _open_step(steps, 'action')
+                if step is not None:
+                    _finish_step(step, at, observation['actionGroupInvocationOutput'].get('metadata'))
+            elif 'finalResponse' in observation:
+                steps.append({'stage': stage, 'step': 'final response', 'start': at, 'duration': 0.0})
+        elif 'rationale' in part:
+            steps.append({'stage': stage, 'step': 'rationale', 'start': at, 'duration': 0.0})
+
+# Where a request's time went, from its timings and trace timeline
+def summarize_timings(timings):
+    steps = timings.get('steps') or []
+    model = [step for step in steps if step['step'] == 'model']
+    actions = [step for step in steps if step['step'] == 'action']
+    model_seconds = sum(step.get('duration', 0.0) for step in model)
+    action_seconds = sum(step.get('duration', 0.0) for step in actions)
+    total = timings.get('total', 0.0)
+    return {
+        'total_seconds': total,
+        'first_token_seconds': timings.get('ttft'),
+        'queued_seconds': timings.get('queued'),
+        'model_calls': len(model),
+        'model_seconds': model_seconds,
+        'action_calls': len(actions),
+        'action_seconds': action_seconds,
+        'other_seconds': max(0.0, total - model_seconds - action_seconds) if steps else None,
+        'input_tokens': sum(step.get('input_tokens') or 0 for step in model),
+        'output_tokens': sum(step.get('output_tokens') or 0 for step in model),
+        'lambda_ms': timings.get('lambda'),
+    }
+
+# One structured log line per answered question, for CloudWatch Logs Insights
+def log_request(conversation_key, timings):
+    record = {'event': 'chat_request', 'conversation': conversation_key, 'path': timings.get('path')}
+    record.update(summarize_timings(timings))
+    print(json.dumps(record), flush=True)
+
+# Debug panel: where the latest answer's time went
+def display_latency_breakdown(timings):
+    summary = summarize_timings(timings)
+    with st.expander("Latency breakdown (latest answer)", expanded=True):
+        st.caption(f"Answered by: {timings.get('path', 'agent')}")
+        columns = st.columns(4)
+        columns[0].metric("Total", f"{summary['total_seconds']:.2f}s")
+        columns[1].metric("Model", f"{summary['model_seconds']:.2f}s", f"{summary['model_calls']} calls", delta_color="off")
+        columns[2].metric("Action groups", f"{summary['action_seconds']:.2f}s", f"{summary['action_calls']} calls", delta_color="off")
+        columns[3].metric("Tokens in / out", f"{summary['input_tokens']} / {summary['output_tokens']}")
+        if timings.get('steps'):
+            st.dataframe([{
+                'stage': step['stage'],
+                'step': step['step'],
+                'name': step.get('name', ''),
+                'start (s)': round(step['start'], 3),
+                'duration (s)': round(step.get('duration', 0.0), 3),
+                'tokens in': step.get('input_tokens'),
+                'tokens out': step.get('output_tokens'),
+            } for step in timings['steps']])
+        if summary['lambda_ms']:
+            st.caption("Weather Lambda stages: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in summary['lambda_ms'].items()))
+
+# Agent calls run on a process-wide pool of worker threads rather than in the
+# sessions' script threads. The pool bounds how many run at once on a task; calls
+# beyond that wait in its queue, and once AGENT_MAX_QUEUE are waiting new ones are
+# turned away instead of piling up. A new question in a conversation cancels the
+# call still running for its previous one. AGENT_MAX_CONCURRENCY is set with the
+# client settings at the top, which size the Bedrock connection pool from it.
+AGENT_MAX_QUEUE = int(os.environ.get('AGENT_MAX_QUEUE', '32'))
+
+class AgentBusy(Exception):
+    pass
+
+# Raised to the reader of a call that a newer question replaced, so its partial
+# answer is not taken for a whole one
+class AgentCancelled(Exception):
+    pass
+
+class AgentCall:
+    DONE = object()
+
+    def __init__(self):
+        self.chunks = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+class AgentInvoker:
+    def __init__(self, max_concurrency=AGENT_MAX_CONCURRENCY, max_queue=AGENT_MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='agent')
+        self._calls = {}  # conversation key -> its current AgentCall
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.stats = {'completed': 0, 'cancelled': 0, 'rejected': 0, 'failed': 0}
+
+    # Run the lazy iterator `chunks` (e.g. stream_bedrock_agent) on the pool and
+    # return a generator of its chunks for the calling script thread. `chunks` may
+    # also be a function that takes the call's cancellation event and returns the
+    # iterator, so it can stop between chunks too (e.g. during trace events)
+    def stream(self, key, chunks, timings=None):
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.stats['rejected'] += 1
+                raise AgentBusy("The assistant is busy right now, please try again in a moment.")
+            previous = self._calls.get(key)
+            if previous is not None:
+                previous.cancel()
+            call = self._calls[key] = AgentCall()
+            self.waiting += 1
+        self._executor.submit(self._run, key, call, chunks, timings, time.perf_counter())
+        return self._consume(call)
+
+    def _run(self, key, call, chunks, timings, submitted):
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+        outcome = 'completed'
+        try:
+            if timings is not None:
+                timings['queued'] = time.perf_counter() - submitted
+            if call.cancelled.is_set():
+                outcome = 'cancelled'
+                return
+            if callable(chunks):
+                chunks = chunks(call.cancelled)
+            try:
+                for chunk in chunks:
+                    if call.cancelled.is_set():
+                        break
+                    call.chunks.put(chunk)
+                if call.cancelled.is_set():
+                    outcome = 'cancelled'
+            finally:
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    close()
+        except Exception as e:
+            outcome = 'failed'
+            call.chunks.put(e)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.stats[outcome] += 1
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            if outcome == 'cancelled':
+                call.chunks.put(AgentCancelled("Stopped: a newer question in this conversation replaced this one."))
+            call.chunks.put(AgentCall.DONE)
+
+    def _consume(self, call):
+        try:
+            while True:
+                item = call.chunks.get()
+                if item is AgentCall.DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Also reached when the script stops reading, e.g. a rerun for a new question
+            call.cancel()
+
+@st.cache_resource
+def get_agent_invoker():
+    return AgentInvoker()
+
+# Running and waiting agent calls on this server, in the sidebar
+def display_agent_load(invoker):
+    stats = invoker.stats
+    st.sidebar.caption(f"Agent calls: {invoker.running}/{invoker.max_concurrency} running, "
+                       f"{invoker.waiting} waiting · {stats['cancelled']} cancelled, {stats['rejected']} turned away")
+
+# Coordinates as written by the geocode and weather action groups
+COORDINATE_PATTERNS = [
+    re.compile(r'Latitude\s+(-?\d+(?:\.\d+)?),\s*Longitude\s+(-?\d+(?:\.\d+)?)'),
+    re.compile(r'Lat:\s*(-?\d+(?:\.\d+)?),\s*Lon:\s*(-?\d+(?:\.\d+)?)'),
+]
+
+# The most recent (latitude, longitude) the agent's action groups resolved, or None.
+# Understands JSON payloads with a "location" object as well as the text responses.
+def extract_location(observations):
+    for text in reversed(observations):
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            payload = None
+        location = payload.get('location') if isinstance(payload, dict) else None
+        # Error payloads name the place they could not resolve but carry no coordinates
+        if isinstance(location, dict) and location.get('latitude') is not None and location.get('longitude') is not None:
+            return float(location['latitude']), float(location['longitude'])
+        for pattern in COORDINATE_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                return float(match.group(1)), float(match.group(2))
+    return None
+
+# The most recent structured forecast payload (see weather_common.noaa) the weather
+# action groups returned, or None. Multi-location results are one payload per line.
+def extract_forecast(observations):
+    for text in reversed(observations):
+        for line in text.splitlines():
+            try:
+                payload = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(payload, dict) and 'schema_version' in payload and payload.get('periods'):
+                return payload
+    return None
+
+# One geocoder for the whole process, only used when the agent did not resolve a location
+@st.cache_resource
+def get_geolocator():
+    return Nominatim(user_agent="weather_app")
+
+@st.cache_data(ttl=24 * 3600, max_entries=1024, show_spinner=False)
+def geocode_city(city):
+    location = get_geolocator().geocode(city)
+    if location:
+        return location.latitude, location.longitude
+    return None
+
+# Render a stream of text chunks into `container` as they arrive. Returns the full
+# text and whether the stream finished cleanly; an interrupted answer ends with the
+# error and must not be cached
+def render_stream(container, chunks):
+    parts = []
+
+    def collect():
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+
+    try:
+        container.write_stream(collect())
+    except AgentCancelled as e:
+        return f"{''.join(parts).rstrip()} ({e})".lstrip(), False
     except Exception as e:
         st.error(f"Error invoking Bedrock agent: {str(e)}")
-        return f"Error invoking agent: {str(e)}"
+        parts.append(f"Error invoking agent: {str(e)}")
+        return ''.join(parts), False
+    return ''.join(parts) or "No response from agent", True
 
-# Function to get weather data using the Bedrock agent
-def get_weather_data(city, bedrock_agent_client):
+# Stream the agent's answer to a plain weather question about `city`
+def stream_weather_data(city, bedrock_agent_client, timings=None, session=None, observations=None, when=None,
+                        cancelled=None):
     agent_id = 'ED0C3Z6GB6'  # Your weather agent ID from your settings
-    input_text = f"What is the weather in {city}?"
+    input_text = f"What is the weather in {city} {when}?" if when and when != 'now' else f"What is the weather in {city}?"
+
+    return stream_bedrock_agent(agent_id, input_text, bedrock_agent_client, timings, session, observations, cancelled)
+
+# (temperature, unit) for right now from a forecast payload: the current hour when
+# hourly data is present, otherwise the first forecast period. None if unknown.
+def extract_temperature(forecast):
+    if not forecast:
+        return None
+    for period in (forecast.get('hourly') or [])[:1] + forecast.get('periods', [])[:1]:
+        if period.get('temp') is not None:
+            return period['temp'], period.get('unit', 'F')
+    return None
+
+# Plain weather questions that need no reasoning, such as "weather in Denver" or
+# "what's the forecast for Portland, OR tomorrow?". Matched against the whole input.
+WEATHER_QUERY_PATTERNS = [
+    re.compile(r"^(?:(?:what|how)(?:'s| is)|show(?: me)?|get|tell me)?\s*(?:the\s+)?(?:current\s+)?"
+               r"(?:weather|forecast|temperature)(?:\s+like)?\s+(?:in|for|at)\s+(?P<place>.+?)"
+               r"(?:\s+(?P<when>today|tonight|tomorrow|now|right now))?$", re.IGNORECASE),
+    re.compile(r"^(?P<place>.+?)\s+(?:weather|forecast)(?:\s+(?P<when>today|tonight|tomorrow|now|right now))?$",
+               re.IGNORECASE),
+]
+PLACE_PATTERN = re.compile(r"^[^\W\d_][\w .,'-]{0,60}$")
+# Words that make a "place" a question the agent should reason about instead
+NOT_A_PLACE = {'and', 'vs', 'versus', 'compared', 'than', 'if', 'should', 'will', 'i', 'me', 'my',
+               'we', 'be', 'like', 'weather', 'forecast', 'next', 'this', 'week', 'weekend'}
+
+# {'city': ..., 'when': 'now' | 'today' | 'tonight' | 'tomorrow'} for a plain weather
+# question, None for anything the agent should handle
+def parse_weather_query(text):
+    text = ' '.join(text.strip().rstrip('?!.').split())
+    for pattern in WEATHER_QUERY_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        place = match.group('place').strip(' ,')
+        if not PLACE_PATTERN.match(place):
+            return None
+        if NOT_A_PLACE & set(re.findall(r"[\w']+", place.lower())):
+            return None
+        when = (match.group('when') or 'now').lower()
+        return {'city': place, 'when': 'now' if when == 'right now' else when}
+    return None
+
+# The forecast period a parsed question asks about, or None if the payload has no such period
+def select_period(forecast, when):
+    periods = forecast.get('periods') or []
+    if when == 'tonight':
+        return next((p for p in periods if p.get('name', '').lower() in ('tonight', 'overnight')), None)
+    if when == 'tomorrow' and periods and periods[0].get('start'):
+        tomorrow = (datetime.fromisoformat(periods[0]['start']).date() + timedelta(days=1)).isoformat()
+        return next((p for p in periods if p.get('start', '').startswith(tomorrow)), None)
+    return periods[0] if periods else None
+
+def describe_period(period):
+    parts = [f"{period['temp']}°{period.get('unit', 'F')}"] if period.get('temp') is not None else []
+    if period.get('short'):
+        parts.append(period['short'])
+    if period.get('wind'):
+        parts.append(f"wind {period['wind']}")
+    if period.get('pop'):
+        parts.append(f"{period['pop']}% chance of precipitation")
+    return ', '.join(parts)
+
+def describe_age(seconds):
+    minutes = max(1, int(seconds // 60))
+    if minutes < 90:
+        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+    return f"{minutes // 60} hours"
+
+# Answer a parsed question from a forecast payload, or None if the payload cannot answer it
+def format_forecast(forecast, city, when):
+    period = select_period(forecast, when)
+    if period is None:
+        return None
+    lines = []
+    hourly = forecast.get('hourly') or []
+    if when == 'now' and hourly:
+        lines.append(f"Right now in {city}: {describe_period(hourly[0])}.")
+    lines.append(f"{period.get('name') or when.capitalize()} in {city}: {describe_period(period)}.")
+    if forecast.get('stale'):
+        # The weather service did not answer in time; this is its last known forecast
+        lines.append(f"(The National Weather Service is not responding, so this forecast is "
+                     f"{describe_age(forecast['stale']['age_seconds'])} old.)")
+    return ' '.join(lines)
+
+# Function name of the combined geocode + forecast Lambda. When it is set, plain
+# weather questions are answered by calling it directly instead of the agent.
+WEATHER_FUNCTION_NAME = os.environ.get('WEATHER_FUNCTION_NAME')
+
+# The forecast payload for a city from the weather Lambda, or None if it could not
+# be found (the agent may still make sense of the question)
+def fetch_forecast(city, lambda_client):
+    event = {
+        'messageVersion': '1.0',
+        'actionGroup': 'StreamlitFastPath',
+        'function': 'get_city_weather',
+        'parameters': [{'name': 'city', 'type': 'string', 'value': city}],
+        'sessionAttributes': {},
+        'promptSessionAttributes': {},
+    }
+    response = lambda_client.invoke(FunctionName=WEATHER_FUNCTION_NAME, Payload=json.dumps(event).encode('utf-8'))
+    if response.get('FunctionError'):
+        return None
+    function_response = json.loads(response['Payload'].read())['response']['functionResponse']
+    if function_response.get('responseState') == 'FAILURE':
+        return None
+    return extract_forecast([function_response['responseBody']['TEXT']['body']])
+
+# Answers to plain weather questions, shared by every session on this server and
+# optionally by all servers through a DynamoDB table (RESPONSE_CACHE_TABLE). Keyed
+# on the question's intent, resolved location and forecast period, so "weather in
+# NYC" and "NYC weather now" share an answer. Answers expire with the NOAA
+# forecast they were built from ("expires" in the forecast payload).
+RESPONSE_CACHE_TABLE = os.environ.get('RESPONSE_CACHE_TABLE')
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+# How long a city name keeps pointing at the location it was resolved to
+LOCATION_ALIAS_TTL = 30 * 24 * 3600
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, table_name=None, dynamodb_client=None):
+        self.max_entries = max_entries
+        self.table_name = table_name
+        self._client = dynamodb_client
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'saved_seconds': 0.0}
 
-    return invoke_bedrock_agent(agent_id, input_text, bedrock_agent_client)
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+        if self._client is None:
+            return None
+        try:
+            item = self._client.get_item(TableName=self.table_name, Key={'pk': {'S': f'answer#{key}'}}).get('Item')
+        except Exception:
+            # The shared table is an optimization; treat errors as misses
+            return None
+        if not item or float(item['expires_at']['N']) <= now:
+            return None
+        value = json.loads(item['value']['S'])
+        self._remember(key, value, float(item['expires_at']['N']))
+        return value
 
-# Function to extract temperature from weather data (ensure you modify it based on actual data structure)
-def extract_temperature(weather_data):
-    # Assuming temperature is embedded in weather_data response.
-    # This is a placeholder - you'll need to adjust according to the actual data format you receive.
-    return "64"  # Placeholder value, update as needed
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-# Function to display map with weather data and temperature
-def display_map(latitude, longitude, weather_data, temperature):
+    def _put(self, key, value, expires_at):
+        self._remember(key, value, expires_at)
+        if self._client is None:
+            return
+        try:
+            self._client.put_item(TableName=self.table_name, Item={
+                'pk': {'S': f'answer#{key}'},
+                'value': {'S': json.dumps(value)},
+                'expires_at': {'N': str(int(expires_at))},
+            })
+        except Exception:
+            pass
+
+    @staticmethod
+    def _city_key(city):
+        return 'city|' + ' '.join(re.findall(r'\w+', city.lower()))
+
+    @staticmethod
+    def _answer_key(location, when):
+        return f'weather|{location}|{when}'
+
+    # The cached answer to a parsed question, or None
+    def lookup(self, query):
+        location = self._get(self._city_key(query['city']))
+        entry = self._get(self._answer_key(location, query['when'])) if location else None
+        with self._lock:
+            if entry is None:
+                self.stats['misses'] += 1
+            else:
+                self.stats['hits'] += 1
+                self.stats['saved_seconds'] += entry.get('latency') or 0.0
+        return entry
+
+    # Cache an answer; `latency` is how long it took to produce (seconds)
+    def store(self, query, latitude, longitude, answer, forecast, latency):
+        expires_at = (forecast or {}).get('expires')
+        if not expires_at or expires_at <= time.time():
+            return
+        location = f'{latitude:.2f},{longitude:.2f}'
+        self._put(self._city_key(query['city']), location, time.time() + LOCATION_ALIAS_TTL)
+        self._put(self._answer_key(location, query['when']), {
+            'answer': answer,
+            'latitude': latitude,
+            'longitude': longitude,
+            'forecast': forecast,
+            'latency': latency,
+        }, expires_at)
+
+@st.cache_resource
+def get_response_cache():
+    if RESPONSE_CACHE_TABLE:
+        return ResponseCache(table_name=RESPONSE_CACHE_TABLE,
+                             dynamodb_client=make_client('dynamodb', DYNAMODB_CLIENT_CONFIG))
+    return ResponseCache()
+
+# Whether the weather Lambda found a place that goes by the name asked for. "Good
+# weather" parses like "Denver weather", and the geocoder's closest match (Goodyear)
+# must not be answered for, or cached under, a name it does not have.
+def exact_place(forecast):
+    return bool(forecast) and forecast.get('location', {}).get('match') == 'exact'
+
+# Answer a parsed weather question from the weather Lambda. Returns the answer and
+# (city, latitude, longitude, popup text, forecast), or (None, None) if it cannot be
+# answered this way and should go to the agent.
+def answer_weather_query(query, timings):
+    start = time.perf_counter()
+    try:
+        forecast = fetch_forecast(query['city'], get_lambda_client())
+    except Exception as e:
+        st.warning(f"Falling back to the agent: {str(e)}")
+        return None, None
+    answer = format_forecast(forecast, query['city'], query['when']) if exact_place(forecast) else None
+    if not answer:
+        return None, None
+    timings['ttft'] = timings['total'] = time.perf_counter() - start
+    location = forecast['location']
+    return answer, (query['city'], float(location['latitude']), float(location['longitude']), answer, forecast)
+
+# Hit rate and time saved by the shared answer cache, in the sidebar
+def display_cache_stats(response_cache):
+    stats = response_cache.stats
+    lookups = stats['hits'] + stats['misses']
+    if lookups:
+        st.sidebar.caption(f"Answer cache (all sessions): {stats['hits']}/{lookups} hits ({stats['hits'] / lookups:.0%}), "
+                           f"{stats['saved_seconds']:.1f}s saved")
+
+# Hourly temperatures from a forecast payload as a line chart
+def display_hourly(forecast):
+    hourly = [period for period in forecast.get('hourly') or [] if period.get('temp') is not None]
+    if hourly:
+        unit = hourly[0].get('unit', 'F')
+        st.line_chart(
+            {f"Temperature (°{unit})": [period['temp'] for period in hourly]},
+        )
+        st.caption(f"Next {len(hourly)} hours, from {hourly[0].get('start', '')}")
+
+# Previously queried cities stay on the map; the oldest drop off beyond this many
+MAP_MAX_CITIES = 20
+MAP_TIMING_SAMPLES = 50
+
+# Add or refresh a city on the session's map, most recent last
+def remember_city(city, latitude, longitude, weather_data, temperature):
+    cities = st.session_state.setdefault('map_cities', {})
+    cities.pop(city, None)
+    cities[city] = (latitude, longitude, weather_data, temperature)
+    while len(cities) > MAP_MAX_CITIES:
+        cities.pop(next(iter(cities)))
+
+# Record a resolved location and its forecast: agent session, map and hourly chart
+def show_forecast(agent_session, city, latitude, longitude, weather_data, forecast):
+    remember_location(agent_session, city, latitude, longitude)
+    st.session_state['forecast'] = forecast
+    st.session_state['weather_data'] = (latitude, longitude, weather_data, extract_temperature(forecast))
+    remember_city(city, *st.session_state['weather_data'])
+
+# HTML for one map with a layer per city, centred on the last one. `cities` is a
+# tuple of (city, latitude, longitude, weather_data, temperature). Memoized on
+# those inputs, so reruns that do not change them (typing in the sidebar, chat
+# replies) skip building and rendering the folium map entirely.
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_map(cities):
+    latitude, longitude = cities[-1][1:3]
     m = folium.Map(location=[latitude, longitude], zoom_start=10)
-    
-    # Add weather info as a circle
-    folium.Circle(
-        location=[latitude, longitude],
-        radius=5000,
-        color='blue',
-        fill=True,
-        fill_opacity=0.5,
-        popup=f"Weather: {weather_data}"
-    ).add_to(m)
-    
-    # Add temperature marker
-    folium.Marker(
-        location=[latitude, longitude],
-        popup=f"Temperature: {temperature}°F",
-        icon=folium.Icon(color='red')
-    ).add_to(m)
-    
-    # Display map in Streamlit
-    st_folium(m, width=700, height=500)
+    for city, latitude, longitude, weather_data, temperature in cities:
+        layer = folium.FeatureGroup(name=city)
+        # Add weather info as a circle
+        folium.Circle(
+            location=[latitude, longitude],
+            radius=5000,
+            color='blue',
+            fill=True,
+            fill_opacity=0.5,
+            popup=f"Weather: {weather_data}"
+        ).add_to(layer)
+        # Add temperature marker
+        if temperature:
+            value, unit = temperature
+            folium.Marker(
+                location=[latitude, longitude],
+                popup=f"Temperature: {value}°{unit}",
+                icon=folium.Icon(color='red')
+            ).add_to(layer)
+        layer.add_to(m)
+    if len(cities) > 1:
+        folium.LayerControl().add_to(m)
+    return m.get_root().render()
+
+# Function to display map with weather data and temperature for every remembered city.
+# The same HTML is sent on every rerun until a city changes, so the iframe is not reloaded.
+def display_map(cities):
+    html = render_map(tuple((city,) + marker for city, marker in cities.items()))
+    # st.iframe replaces components.html in newer Streamlit releases
+    if hasattr(st, 'iframe'):
+        st.iframe(html, width=700, height=500)
+    else:
+        components.html(html, width=700, height=500)
+
+# Time each map render and show the latest against the recent median
+def timed_display_map(cities):
+    start = time.perf_counter()
+    display_map(cities)
+    elapsed = time.perf_counter() - start
+    samples = st.session_state.setdefault('map_render_times', [])
+    samples.append(elapsed)
+    del samples[:-MAP_TIMING_SAMPLES]
+    median = sorted(samples)[len(samples) // 2]
+    st.caption(f"Map rendered in {elapsed * 1000:.1f} ms · median {median * 1000:.1f} ms over {len(samples)} reruns")
 
 # Main Streamlit app layout
 def main():
@@ -113,14 +917,10 @@ def main():
     """)
 
     try:
-        # Initialize Bedrock clients
-        if 'bedrock_client' not in st.session_state:
-            st.session_state['bedrock_client'] = get_bedrock_client()
-        if 'bedrock_agent_client' not in st.session_state:
-            st.session_state['bedrock_agent_client'] = get_bedrock_agent_client()
-
-        bedrock_client = st.session_state['bedrock_client']
-        bedrock_agent_client = st.session_state['bedrock_agent_client']
+        # Initialize Bedrock clients; they are shared by all sessions on this server
+        # so connections are reused across users
+        bedrock_client = get_bedrock_client()
+        bedrock_agent_client = get_bedrock_agent_client()
 
         # Sidebar for chatbot
         st.sidebar.title("Anthropic's Claude 3.5 Sonnent Chatbot - Running on Amazon Bedrock!")
@@ -128,48 +928,107 @@ def main():
         **This weather app demonstrates Amazon Bedrock Inference and Amazon Bedrock Agents. The Amazon Bedrock Agent, powered by a foundation model like Claude, orchestrates the interaction and can use defined action groups to make API calls to public weather APIs. The agent then integrates this information to provide a comprehensive response.**
         """)
 
-        if 'chat_history' not in st.session_state:
-            st.session_state['chat_history'] = []
+        chat_history = get_chat_history()
         
         if 'last_query' not in st.session_state:
             st.session_state['last_query'] = ""
 
+        if st.sidebar.button("New conversation"):
+            st.session_state['agent_session'] = new_agent_session()
+            chat_history = st.session_state['chat_history'] = ChatHistory()
+            st.session_state['chat_visible'] = CHAT_PAGE_SIZE
+            st.session_state['weather_data'] = None
+            st.session_state['forecast'] = None
+            st.session_state['map_cities'] = {}
+        agent_session = get_agent_session()
+        conversation_key = st.session_state['conversation_key']
+        agent_invoker = get_agent_invoker()
+
         user_input = st.sidebar.text_input("Ask something to the chatbot:")
+        show_latency = st.sidebar.checkbox("Show latency breakdown")
 
         if user_input and user_input != st.session_state['last_query']:
+            # The answer is rendered here while it streams in, then moved into the chat history below
+            live_response = st.empty()
+            timings = {}
             with st.spinner('Generating response...'):
-                # If user asks for weather, detect the city from the input
-                if "weather" in user_input.lower():
-                    try:
-                        city = user_input.lower().split("in")[-1].strip()
-                        geolocator = Nominatim(user_agent="weather_app")
-                        location = geolocator.geocode(city)
-                        if location:
-                            latitude, longitude = location.latitude, location.longitude
-                            weather_data = get_weather_data(city, bedrock_agent_client)
-                            temperature = extract_temperature(weather_data)  # Placeholder, modify based on actual weather data
-                            st.session_state['weather_data'] = (latitude, longitude, weather_data, temperature)
-                            bot_response = f"Here is the weather in {city}: {weather_data}"
-                        else:
-                            bot_response = "Sorry, I couldn't find that city."
-                    except Exception as e:
-                        bot_response = f"Error processing city: {str(e)}"
+                start = time.perf_counter()
+                query = parse_weather_query(user_input)
+                response_cache = get_response_cache()
+                cached = response_cache.lookup(query) if query else None
+                # (city, latitude, longitude, popup text, forecast) of the location the answer is about
+                resolved = None
+                # False when the agent's answer was cut short by an error
+                completed = True
+                if cached:
+                    bot_response = cached['answer']
+                    timings.update(cached=True, saved=cached.get('latency') or 0.0, path='cache',
+                                   total=time.perf_counter() - start)
+                    resolved = (query['city'], cached['latitude'], cached['longitude'], cached['answer'], cached['forecast'])
                 else:
-                    # Standard non-weather query handling
-                    bot_response = invoke_bedrock_agent('ED0C3Z6GB6', user_input, bedrock_agent_client)
-                
-                st.session_state.chat_history.append({"user": user_input, "bot": bot_response})
-                st.session_state['last_query'] = user_input
+                    bot_response = None
+                    # Plain weather questions skip the agent when the weather Lambda is configured
+                    if query and WEATHER_FUNCTION_NAME:
+                        bot_response, resolved = answer_weather_query(query, timings)
+                        timings['path'] = 'weather function'
+                    if bot_response is None and query and not WEATHER_FUNCTION_NAME:
+                        timings['path'] = 'agent'
+                        try:
+                            city = query['city']
+                            observations = []
+                            weather_data, completed = render_stream(live_response, agent_invoker.stream(conversation_key, lambda cancelled: stream_weather_data(city, bedrock_agent_client, timings, agent_session, observations, query['when'], cancelled), timings))
+                            # Use the coordinates the agent already resolved; geocode locally only if it did not
+                            location = extract_location(observations) or geocode_city(city)
+                            if location:
+                                resolved = (city, *location, weather_data, extract_forecast(observations))
+                            bot_response = f"Here is the weather in {city}: {weather_data}"
+                        except Exception as e:
+                            completed = False
+                            bot_response = f"Error processing city: {str(e)}"
+                    elif bot_response is None:
+                        # Open-ended questions go to the agent as they are, and so do
+                        # those the weather Lambda could not answer for an exact place
+                        timings['path'] = 'agent'
+                        observations = []
+                        bot_response, completed = render_stream(live_response, agent_invoker.stream(conversation_key, lambda cancelled: stream_bedrock_agent('ED0C3Z6GB6', user_input, bedrock_agent_client, timings, agent_session, observations, cancelled), timings))
+                        location = extract_location(observations)
+                        if location:
+                            forecast = extract_forecast(observations)
+                            city = (forecast or {}).get('location', {}).get('city') or agent_session['attributes'].get('city', '')
+                            if forecast:
+                                resolved = (city, *location, bot_response, forecast)
+                            else:
+                                remember_location(agent_session, city, *location)
+                    if resolved and resolved[4] and resolved[4].get('timings'):
+                        # Stage timings reported by the weather Lambda that produced the forecast
+                        timings['lambda'] = resolved[4]['timings']
+                    if query and resolved and completed and exact_place(resolved[4]):
+                        # Share only the answer built from the forecast: the agent's own text can carry
+                        # details from this conversation that other users must not see
+                        answer = format_forecast(resolved[4], query['city'], query['when'])
+                        if answer:
+                            response_cache.store(query, resolved[1], resolved[2], answer, resolved[4], timings.get('total'))
+                if resolved:
+                    show_forecast(agent_session, *resolved)
+            live_response.empty()
+            log_request(conversation_key, timings)
+
+            chat_history.append({"user": user_input, "bot": bot_response, "timings": timings})
+            st.session_state['last_query'] = user_input
+
+        display_cache_stats(get_response_cache())
+        display_agent_load(agent_invoker)
 
-        if st.session_state.chat_history:
-            for i, chat in enumerate(st.session_state.chat_history):
-                message(chat['user'], is_user=True, key=f"user_{i}")
-                message(chat['bot'], is_user=False, key=f"bot_{i}")
+        if chat_history:
+            display_chat_history(chat_history)
+            if show_latency:
+                display_latency_breakdown(chat_history.window(1)[0][1].get('timings') or {})
 
         # Display the map if weather data is present
-        if 'weather_data' in st.session_state and st.session_state['weather_data']:
-            latitude, longitude, weather_data, temperature = st.session_state['weather_data']
-            display_map(latitude, longitude, weather_data, temperature)
+        if st.session_state.get('map_cities'):
+            timed_display_map(st.session_state['map_cities'])
+        if st.session_state.get('forecast'):
+            display_hourly(st.session_state['forecast'])
 
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
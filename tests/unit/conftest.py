@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Make the Lambda layer and handler directories importable the way the
+# Lambda runtime does (layer code under /opt/python, handler dir on sys.path),
+# and the Streamlit app as a module
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LAMBDA_DIR = os.path.join(ROOT, 'lambda_functions')
+
+for path in (
+    os.path.join(LAMBDA_DIR, 'common', 'python'),
+    os.path.join(LAMBDA_DIR, 'get_weather'),
+    os.path.join(LAMBDA_DIR, 'geocode_city'),
+    os.path.join(LAMBDA_DIR, 'get_city_weather'),
+    os.path.join(ROOT, 'streamlit_app'),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A few iterations of each benchmark, so a handler change cannot break them
+# unnoticed. Each runs in its own process: the harness reloads the shared
+# modules with its own configuration.
+BENCHMARKS = [
+    ['benchmarks.bench_weather_pool', '-n', '3'],
+    ['benchmarks.bench_multi_city', '--locations', '2', '--latency', '0', '-n', '2'],
+    ['benchmarks.bench_action_group', '-n', '10'],
+    ['benchmarks.bench_gazetteer', '--rows', '100', '-n', '20'],
+    ['benchmarks.bench_map_render', '--cities', '2', '--reruns-per-query', '2', '-n', '2'],
+    ['benchmarks.load_test', '--rps', '5', '--duration', '1'],
+]
+
+
+@pytest.mark.parametrize('command', BENCHMARKS, ids=lambda command: command[0].rsplit('.', 1)[-1])
+def test_benchmark_runs_offline(command):
+    env = dict(os.environ)
+    # Nothing may reach the public APIs: point them at a closed port
+    env.update(NOAA_API_URL='http://127.0.0.1:9', NOMINATIM_URL='http://127.0.0.1:9')
+    result = subprocess.run([sys.executable, '-m'] + command, cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,58 @@
+import json
+
+import City_Weather_Lambda as handler
+
+
+def make_event(city=None):
+    return {
+        'actionGroup': 'WeatherActionGroup',
+        'function': 'get_city_weather',
+        'parameters': [{'name': 'city', 'type': 'string', 'value': city}] if city else [],
+        'sessionAttributes': {},
+        'promptSessionAttributes': {},
+    }
+
+
+def test_geocodes_and_fetches_forecast_in_one_call(monkeypatch):
+    monkeypatch.setattr(handler, 'geocode_city',
+                        lambda city, deadline=None: [{'lat': '47.6', 'lon': '-122.3', 'match': 'exact'}])
+    monkeypatch.setattr(handler.noaa, 'build_forecast', lambda lat, lon, city, timings=None, deadline=None: {
+        'schema_version': 1,
+        'location': {'city': city, 'latitude': lat, 'longitude': lon},
+        'periods': [{'name': 'Today', 'temp': 64, 'unit': 'F', 'short': 'Sunny'}],
+    })
+
+    response = handler.lambda_handler(make_event('Seattle'), None)
+
+    body = json.loads(response['response']['functionResponse']['responseBody']['TEXT']['body'])
+    assert body['location'] == {'city': 'Seattle', 'latitude': '47.6', 'longitude': '-122.3', 'match': 'exact'}
+    assert body['periods'][0]['temp'] == 64
+    assert response['sessionAttributes'] == {'city': 'Seattle', 'latitude': '47.6', 'longitude': '-122.3'}
+
+
+def test_unknown_city_fails_without_fetching_forecast(monkeypatch):
+    monkeypatch.setattr(handler, 'geocode_city', lambda city, deadline=None: [])
+
+    response = handler.lambda_handler(make_event('Nowhereville'), None)
+
+    assert response['response']['functionResponse']['responseState'] == 'FAILURE'
+
+
+def test_missing_city_reprompts():
+    response = handler.lambda_handler(make_event(), None)
+    assert response['response']['functionResponse']['responseState'] == 'REPROMPT'
+
+
+def test_unavailable_forecast_fails_with_a_readable_message(monkeypatch):
+    def build_forecast(lat, lon, city, timings=None, deadline=None):
+        assert deadline.remaining() > 0
+        raise handler.noaa.ForecastUnavailable('https://api.weather.gov/points/47.6,-122.3 did not answer in time')
+
+    monkeypatch.setattr(handler, 'geocode_city', lambda city, deadline=None: [{'lat': '47.6', 'lon': '-122.3'}])
+    monkeypatch.setattr(handler.noaa, 'build_forecast', build_forecast)
+
+    response = handler.lambda_handler(make_event('Seattle'), None)
+
+    function_response = response['response']['functionResponse']
+    assert function_response['responseState'] == 'FAILURE'
+    assert function_response['responseBody']['TEXT']['body'].startswith('The National Weather Service')
@@ -0,0 +1,125 @@
+import json
+
+import NOAA_API_Weather_Lambda as handler
+from weather_common.gazetteer import Gazetteer, build_index, read_geonames
+
+
+GEONAMES = [
+    f'{i}\t{name}\t{name}\t\t{lat}\t{lon}\tP\tPPLA2\tUS\t\t{state}\t\t\t\t{population}\t\t\t\t2024-01-01'
+    for i, (name, state, lat, lon, population) in enumerate([
+        ('Portland', 'OR', 45.52, -122.68, 652503), ('Portland', 'ME', 43.66, -70.26, 68408),
+        ('Seattle', 'WA', 47.61, -122.33, 749256), ('Boston', 'MA', 42.36, -71.06, 675647),
+        ('Washington', 'DC', 38.90, -77.04, 689545),
+    ])
+]
+
+
+def test_parse_locations_accepts_json_and_plain_lists(monkeypatch, tmp_path):
+    path = str(tmp_path / 'gazetteer.sqlite')
+    build_index(read_geonames(GEONAMES), path)
+    monkeypatch.setattr(handler, 'default_gazetteer', lambda: Gazetteer(path))
+
+    assert handler.parse_locations('["Boston", {"latitude": "40.7", "longitude": "-74.0"}]') == [
+        {'city': 'Boston'}, {'latitude': '40.7', 'longitude': '-74.0'},
+    ]
+    assert handler.parse_locations('Boston, NYC and DC') == [
+        {'city': 'Boston'}, {'city': 'NYC'}, {'city': 'DC'},
+    ]
+    assert handler.parse_locations('Boston, NYC, DC') == [
+        {'city': 'Boston'}, {'city': 'NYC'}, {'city': 'DC'},
+    ]
+    assert handler.parse_locations('Seattle, LA') == [{'city': 'Seattle'}, {'city': 'LA'}]
+    assert handler.parse_locations('Portland, OR; Portland, ME') == [
+        {'city': 'Portland, OR'}, {'city': 'Portland, ME'},
+    ]
+    assert handler.parse_locations('Portland, OR and Seattle, WA') == [
+        {'city': 'Portland, OR'}, {'city': 'Seattle, WA'},
+    ]
+    assert handler.parse_locations('Portland, OR, Seattle, WA, Denver') == [
+        {'city': 'Portland, OR'}, {'city': 'Seattle, WA'}, {'city': 'Denver'},
+    ]
+
+
+def test_multi_location_request_reports_per_item_errors(monkeypatch):
+    def build_forecast(latitude, longitude, city=None, hourly=True, deadline=None):
+        if latitude == 'bad':
+            raise handler.noaa.ForecastUnavailable('api.weather.gov is failing')
+        assert not hourly
+        return {'schema_version': 1, 'location': {'city': city}, 'periods': [{'temp': int(latitude)}]}
+
+    monkeypatch.setattr(handler.noaa, 'build_forecast', build_forecast)
+    event = {
+        'actionGroup': 'WeatherActionGroup',
+        'function': 'get_weather',
+        'parameters': [{
+            'name': 'locations',
+            'value': '[{"city": "A", "latitude": "1", "longitude": "2"},'
+                     ' {"city": "B", "latitude": "bad", "longitude": "2"}]',
+        }],
+        'sessionAttributes': {},
+    }
+
+    response = handler.lambda_handler(event, None)
+
+    body = response['response']['functionResponse']['responseBody']['TEXT']['body']
+    first, second = [json.loads(line) for line in body.splitlines()]
+    assert first['periods'] == [{'temp': 1}]
+    assert second['location']['city'] == 'B'
+    assert second['error'].startswith('The National Weather Service')
+    assert 'failing' not in second['error']
+
+
+def single_city_event(city, session_attributes):
+    return {
+        'actionGroup': 'WeatherActionGroup',
+        'function': 'get_weather',
+        'parameters': [{'name': 'city', 'value': city}],
+        'sessionAttributes': session_attributes,
+    }
+
+
+def test_session_coordinates_are_only_used_for_their_city(monkeypatch):
+    geocoded = []
+
+    def geocode_city(city, deadline=None):
+        geocoded.append(city)
+        return [{'lat': '42.36', 'lon': '-71.06'}]
+
+    def build_forecast(latitude, longitude, city=None, timings=None, deadline=None):
+        return {'schema_version': 1, 'location': {'city': city, 'latitude': latitude, 'longitude': longitude}}
+
+    monkeypatch.setattr(handler, 'geocode_city', geocode_city)
+    monkeypatch.setattr(handler.noaa, 'build_forecast', build_forecast)
+    seattle = {'city': 'Seattle', 'latitude': '47.6', 'longitude': '-122.3'}
+
+    response = handler.lambda_handler(single_city_event('seattle', dict(seattle)), None)
+    body = json.loads(response['response']['functionResponse']['responseBody']['TEXT']['body'])
+    assert body['location']['latitude'] == '47.6'
+    assert geocoded == []
+
+    response = handler.lambda_handler(single_city_event('Boston', dict(seattle)), None)
+    body = json.loads(response['response']['functionResponse']['responseBody']['TEXT']['body'])
+    assert body['location'] == {'city': 'Boston', 'latitude': '42.36', 'longitude': '-71.06'}
+    assert geocoded == ['Boston']
+    assert response['sessionAttributes']['city'] == 'Boston'
+
+
+def test_locations_past_the_limit_are_reported(monkeypatch):
+    monkeypatch.setattr(handler, 'MAX_LOCATIONS', 2)
+    monkeypatch.setattr(handler.noaa, 'build_forecast', lambda latitude, longitude, city=None, hourly=True,
+                        deadline=None: {'schema_version': 1, 'location': {'city': city}})
+    locations = [{'city': name, 'latitude': '1', 'longitude': '2'} for name in 'ABC']
+    event = {
+        'actionGroup': 'WeatherActionGroup',
+        'function': 'get_weather',
+        'parameters': [{'name': 'locations', 'value': json.dumps(locations)}],
+        'sessionAttributes': {},
+    }
+
+    response = handler.lambda_handler(event, None)
+
+    body = response['response']['functionResponse']['responseBody']['TEXT']['body']
+    results = [json.loads(line) for line in body.splitlines()]
+    assert [result['location']['city'] for result in results] == ['A', 'B', 'C']
+    assert 'error' not in results[1]
+    assert 'at most 2 locations' in results[2]['error']
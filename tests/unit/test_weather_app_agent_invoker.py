@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+import weather_app as app
+
+
+def chunks(*parts, gate=None, closed=None):
+    try:
+        for part in parts:
+            if gate is not None:
+                gate.wait(5)
+            yield part
+    finally:
+        if closed is not None:
+            closed.set()
+
+
+def test_chunks_are_streamed_from_the_pool():
+    invoker = app.AgentInvoker(max_concurrency=2, max_queue=2)
+    timings = {}
+
+    assert ''.join(invoker.stream('a', chunks('Sun', 'ny'), timings)) == 'Sunny'
+    assert 'queued' in timings
+    assert invoker.stats['completed'] == 1
+    assert (invoker.running, invoker.waiting) == (0, 0)
+
+
+def test_errors_are_raised_in_the_reader():
+    def failing():
+        yield 'partial'
+        raise RuntimeError('throttled')
+
+    invoker = app.AgentInvoker(max_concurrency=1, max_queue=1)
+    with pytest.raises(RuntimeError, match='throttled'):
+        list(invoker.stream('a', failing()))
+    assert invoker.stats['failed'] == 1
+
+
+def test_new_question_cancels_the_previous_call():
+    invoker = app.AgentInvoker(max_concurrency=2, max_queue=2)
+    gate, closed = threading.Event(), threading.Event()
+    first = invoker.stream('conversation', chunks('a', 'b', 'c', gate=gate, closed=closed))
+
+    second = invoker.stream('conversation', chunks('new'))
+    gate.set()
+
+    assert ''.join(second) == 'new'
+    assert closed.wait(5)
+    # The first reader learns its answer was cut short
+    with pytest.raises(app.AgentCancelled):
+        ''.join(first)
+    assert invoker.stats['cancelled'] == 1
+
+
+def test_calls_beyond_the_queue_are_turned_away():
+    invoker = app.AgentInvoker(max_concurrency=1, max_queue=1)
+    gate = threading.Event()
+    running = invoker.stream('a', chunks('x', gate=gate))
+    next_chunk = threading.Thread(target=lambda: next(running))
+    next_chunk.start()
+    deadline = time.monotonic() + 5
+    while invoker.running < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    waiting = invoker.stream('b', chunks('y'))
+    try:
+        with pytest.raises(app.AgentBusy):
+            invoker.stream('c', chunks('z'))
+        assert invoker.stats['rejected'] == 1
+    finally:
+        gate.set()
+        next_chunk.join(5)
+    assert list(waiting) == ['y']
+
+
+def test_cancel_during_trace_events_frees_the_worker():
+    class Completion:
+        # An agent call still orchestrating: trace events only, no text yet
+        def __init__(self):
+            self.closed = threading.Event()
+
+        def __iter__(self):
+            while not self.closed.is_set():
+                time.sleep(0.01)
+                yield {'trace': {'trace': {'orchestrationTrace': {'rationale': {'text': 'thinking'}}}}}
+
+        def close(self):
+            self.closed.set()
+
+    class Client:
+        def __init__(self):
+            self.completion = Completion()
+
+        def invoke_agent(self, **request):
+            return {'completion': self.completion}
+
+    client = Client()
+    invoker = app.AgentInvoker(max_concurrency=1, max_queue=1)
+    first = invoker.stream('conversation', lambda cancelled: app.stream_bedrock_agent(
+        'agent', 'Why is the sky blue?', client, cancelled=cancelled))
+    deadline = time.monotonic() + 5
+    while invoker.running < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    second = invoker.stream('conversation', chunks('new'))
+
+    assert client.completion.closed.wait(5)
+    assert ''.join(second) == 'new'
+    with pytest.raises(app.AgentCancelled):
+        ''.join(first)
+    assert invoker.stats['cancelled'] == 1
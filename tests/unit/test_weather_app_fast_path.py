@@ -0,0 +1,151 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import weather_app as app
+
+FORECAST = {
+    'schema_version': 1,
+    'location': {'city': 'Denver', 'latitude': '39.74', 'longitude': '-104.99'},
+    'periods': [
+        {'name': 'This Afternoon', 'start': '2026-10-18T14:00:00-06:00', 'temp': 71, 'unit': 'F', 'short': 'Sunny'},
+        {'name': 'Tonight', 'start': '2026-10-18T18:00:00-06:00', 'temp': 44, 'unit': 'F', 'short': 'Clear'},
+        {'name': 'Monday', 'start': '2026-10-19T06:00:00-06:00', 'temp': 68, 'unit': 'F',
+         'short': 'Partly Sunny', 'wind': '10 mph W', 'pop': 20},
+    ],
+    'hourly': [{'start': '2026-10-18T14:00:00-06:00', 'temp': 69, 'unit': 'F', 'short': 'Sunny'}],
+}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('weather in Indianapolis', {'city': 'Indianapolis', 'when': 'now'}),
+    ("What's the weather like in Portland, OR?", {'city': 'Portland, OR', 'when': 'now'}),
+    ('forecast for St. Louis tomorrow', {'city': 'St. Louis', 'when': 'tomorrow'}),
+    ('Denver weather tonight', {'city': 'Denver', 'when': 'tonight'}),
+    ('temperature in São Paulo right now', {'city': 'São Paulo', 'when': 'now'}),
+])
+def test_plain_weather_questions_are_parsed(text, expected):
+    assert app.parse_weather_query(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'Should I bring an umbrella in Seattle?',
+    'weather in Boston and New York',
+    'how does the weather in Miami compare to Tampa',
+    'weather in Chicago next week',
+    'tell me a joke',
+])
+def test_open_ended_questions_go_to_the_agent(text):
+    assert app.parse_weather_query(text) is None
+
+
+def test_format_forecast_picks_the_requested_period():
+    assert app.format_forecast(FORECAST, 'Denver', 'now') == (
+        'Right now in Denver: 69°F, Sunny. This Afternoon in Denver: 71°F, Sunny.'
+    )
+    assert app.format_forecast(FORECAST, 'Denver', 'tonight') == 'Tonight in Denver: 44°F, Clear.'
+    assert app.format_forecast(FORECAST, 'Denver', 'tomorrow') == (
+        'Monday in Denver: 68°F, Partly Sunny, wind 10 mph W, 20% chance of precipitation.'
+    )
+
+
+def test_format_forecast_notes_the_age_of_a_stale_forecast():
+    stale = dict(FORECAST, stale={'age_seconds': 2 * 3600 + 60, 'as_of': 1760800000})
+    assert app.format_forecast(stale, 'Denver', 'tonight') == (
+        'Tonight in Denver: 44°F, Clear. '
+        '(The National Weather Service is not responding, so this forecast is 2 hours old.)'
+    )
+    assert app.describe_age(30) == '1 minute'
+    assert app.describe_age(45 * 60) == '45 minutes'
+
+
+class FakeLambda:
+    def __init__(self, state, body):
+        self.result = {'response': {'functionResponse': {
+            'responseState': state, 'responseBody': {'TEXT': {'body': body}},
+        }}}
+        self.calls = []
+
+    def invoke(self, FunctionName, Payload):
+        self.calls.append((FunctionName, json.loads(Payload)))
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(self.result).encode('utf-8'))}
+
+
+def test_fetch_forecast_invokes_the_weather_function(monkeypatch):
+    monkeypatch.setattr(app, 'WEATHER_FUNCTION_NAME', 'GetCityWeather')
+    client = FakeLambda('REPROMPT', json.dumps(FORECAST))
+
+    assert app.fetch_forecast('Denver', client) == FORECAST
+    name, event = client.calls[0]
+    assert name == 'GetCityWeather'
+    assert event['parameters'] == [{'name': 'city', 'type': 'string', 'value': 'Denver'}]
+
+
+@pytest.mark.parametrize('text', [
+    'Good weather', 'Sunny weather', 'Winter weather', 'Great weather', 'Nice weather today',
+])
+def test_descriptions_of_the_weather_are_not_answered_for_a_nearby_name(monkeypatch, text):
+    # These parse like "Denver weather"; the Lambda finds only a prefix match
+    # (good -> Goodyear), which must go to the agent rather than be answered
+    query = app.parse_weather_query(text)
+    forecast = dict(FORECAST, location=dict(FORECAST['location'], match='prefix'))
+    monkeypatch.setattr(app, 'WEATHER_FUNCTION_NAME', 'GetCityWeather')
+    monkeypatch.setattr(app, 'get_lambda_client', lambda: FakeLambda('REPROMPT', json.dumps(forecast)))
+    assert app.answer_weather_query(query, {}) == (None, None)
+
+
+def test_exact_places_are_answered(monkeypatch):
+    forecast = dict(FORECAST, location=dict(FORECAST['location'], match='exact'))
+    monkeypatch.setattr(app, 'WEATHER_FUNCTION_NAME', 'GetCityWeather')
+    monkeypatch.setattr(app, 'get_lambda_client', lambda: FakeLambda('REPROMPT', json.dumps(forecast)))
+    answer, resolved = app.answer_weather_query({'city': 'Denver', 'when': 'tonight'}, {})
+    assert answer == 'Tonight in Denver: 44°F, Clear.'
+    assert resolved[1:3] == (39.74, -104.99)
+
+
+def test_fetch_forecast_returns_none_for_unknown_cities():
+    client = FakeLambda('FAILURE', 'Could not find location data for the city: Nowhereville.')
+    assert app.fetch_forecast('Nowhereville', client) is None
+
+
+def test_error_payloads_without_coordinates_are_skipped():
+    error = json.dumps({'schema_version': 1, 'location': {'city': 'Nowhereville'}, 'error': 'not found'})
+    assert app.extract_location([error]) is None
+    assert app.extract_location(['Latitude 39.74, Longitude -104.99', error]) == (39.74, -104.99)
+
+
+def test_clients_are_created_one_at_a_time(monkeypatch):
+    class Session:
+        # Fails if two threads are inside client() at once
+        def __init__(self):
+            self.active = 0
+            self.overlapped = False
+
+        def client(self, service_name, config=None):
+            self.active += 1
+            self.overlapped |= self.active > 1
+            time.sleep(0.01)
+            self.active -= 1
+            return service_name
+
+    session = Session()
+    monkeypatch.setattr(app, 'get_boto3_session', lambda: session)
+    threads = [threading.Thread(target=app.make_client, args=(name,))
+               for name in ('bedrock-runtime', 'bedrock-agent-runtime', 'lambda', 'dynamodb')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not session.overlapped
+
+
+def test_clients_the_user_waits_on_give_up_quickly():
+    # One Bedrock connection per agent worker; the Lambda and cache table must
+    # not hold a question for the Bedrock read timeout
+    assert app.BEDROCK_CLIENT_CONFIG.max_pool_connections == app.AGENT_MAX_CONCURRENCY
+    assert app.LAMBDA_CLIENT_CONFIG.read_timeout <= 10
+    assert app.DYNAMODB_CLIENT_CONFIG.read_timeout <= 2
+    assert app.DYNAMODB_CLIENT_CONFIG.retries['max_attempts'] <= 2
@@ -0,0 +1,73 @@
+import time
+
+import weather_app as app
+
+NYC = {'city': 'NYC', 'when': 'now'}
+
+
+def forecast(expires_in=600):
+    return {'schema_version': 1, 'periods': [{'temp': 60}], 'expires': int(time.time()) + expires_in}
+
+
+class FakeDynamoDB:
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, TableName, Key):
+        item = self.items.get(Key['pk']['S'])
+        return {'Item': item} if item else {}
+
+    def put_item(self, TableName, Item):
+        self.items[Item['pk']['S']] = Item
+
+
+def test_rephrased_questions_share_an_answer():
+    cache = app.ResponseCache()
+    assert cache.lookup(NYC) is None
+    cache.store(NYC, 40.7128, -74.006, 'Sunny, 60°F', forecast(), latency=3.5)
+
+    entry = cache.lookup({'city': 'nyc', 'when': 'now'})
+
+    assert entry['answer'] == 'Sunny, 60°F'
+    assert cache.lookup({'city': 'NYC', 'when': 'tomorrow'}) is None
+    assert cache.stats == {'hits': 1, 'misses': 2, 'saved_seconds': 3.5}
+
+
+def test_answers_are_not_kept_past_the_forecast_expiry():
+    cache = app.ResponseCache()
+    cache.store(NYC, 40.71, -74.0, 'Sunny', forecast(expires_in=-1), latency=1.0)
+    cache.store({'city': 'Denver', 'when': 'now'}, 39.74, -104.99, 'Clear', {'periods': []}, latency=1.0)
+
+    assert cache.lookup(NYC) is None
+    assert cache.lookup({'city': 'Denver', 'when': 'now'}) is None
+
+
+def test_shared_backend_serves_other_servers():
+    table = FakeDynamoDB()
+    app.ResponseCache(table_name='t', dynamodb_client=table).store(
+        NYC, 40.71, -74.0, 'Sunny', forecast(), latency=2.0)
+
+    other = app.ResponseCache(table_name='t', dynamodb_client=table)
+
+    assert other.lookup(NYC)['answer'] == 'Sunny'
+
+
+def test_interrupted_streams_are_reported_as_incomplete():
+    class Container:
+        def write_stream(self, chunks):
+            for _ in chunks:
+                pass
+
+    def chunks(error=None):
+        yield 'Sunny, '
+        if error:
+            raise error
+        yield '60°F'
+
+    assert app.render_stream(Container(), chunks()) == ('Sunny, 60°F', True)
+    text, completed = app.render_stream(Container(), chunks(RuntimeError('stream reset')))
+    assert text == 'Sunny, Error invoking agent: stream reset'
+    assert not completed
+    text, completed = app.render_stream(Container(), chunks(app.AgentCancelled('Stopped')))
+    assert text == 'Sunny, (Stopped)'
+    assert not completed
@@ -0,0 +1,34 @@
+import weather_app as app
+
+
+def orchestration(part):
+    return {'orchestrationTrace': part}
+
+
+def test_trace_events_become_a_timeline():
+    timings = {'total': 2.0}
+    events = [
+        (0.1, orchestration({'modelInvocationInput': {'traceId': 't1'}})),
+        (0.9, orchestration({'modelInvocationOutput': {'traceId': 't1', 'metadata': {
+            'usage': {'inputTokens': 900, 'outputTokens': 40}}}})),
+        (0.9, orchestration({'invocationInput': {'invocationType': 'ACTION_GROUP', 'actionGroupInvocationInput': {
+            'actionGroupName': 'WeatherActionGroup', 'function': 'get_city_weather'}}})),
+        (1.3, orchestration({'observation': {'type': 'ACTION_GROUP', 'actionGroupInvocationOutput': {'text': '{}'}}})),
+        (1.3, orchestration({'modelInvocationInput': {'traceId': 't2'}})),
+        (1.9, orchestration({'modelInvocationOutput': {'traceId': 't2', 'metadata': {
+            'totalTimeMs': 550, 'usage': {'inputTokens': 1200, 'outputTokens': 80}}}})),
+        (1.9, orchestration({'observation': {'type': 'FINISH', 'finalResponse': {'text': 'Sunny'}}})),
+    ]
+    for at, trace in events:
+        app.record_trace(timings, trace, at)
+
+    assert [(step['step'], step.get('name')) for step in timings['steps']] == [
+        ('model', None), ('action', 'get_city_weather'), ('model', None), ('final response', None),
+    ]
+    summary = app.summarize_timings(timings)
+    assert summary['model_calls'] == 2
+    # The second model call reports its own duration
+    assert round(summary['model_seconds'], 3) == 0.8 + 0.55
+    assert round(summary['action_seconds'], 3) == 0.4
+    assert (summary['input_tokens'], summary['output_tokens']) == (2100, 120)
+    assert round(summary['other_seconds'], 3) == 0.25
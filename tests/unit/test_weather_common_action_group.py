@@ -0,0 +1,44 @@
+from weather_common.action_group import ActionGroupRequest, BodyWriter, dumps, loads
+
+EVENT = {
+    'messageVersion': '1.0',
+    'actionGroup': 'WeatherActionGroup',
+    'function': 'geocode_city',
+    'parameters': [{'name': 'city', 'type': 'string', 'value': 'Seattle'}],
+    'sessionAttributes': {'latitude': '47.6'},
+}
+
+
+def test_parses_event_and_builds_envelope():
+    request = ActionGroupRequest.from_event(EVENT)
+    assert request.get('city') == 'Seattle'
+    assert request.get('missing', 'x') == 'x'
+
+    response = request.reprompt('hello')
+
+    assert response == {
+        'messageVersion': '1.0',
+        'response': {
+            'actionGroup': 'WeatherActionGroup',
+            'function': 'geocode_city',
+            'functionResponse': {
+                'responseState': 'REPROMPT',
+                'responseBody': {'TEXT': {'body': 'hello'}},
+            },
+        },
+        'sessionAttributes': {'latitude': '47.6'},
+        'promptSessionAttributes': {},
+    }
+    assert 'responseState' not in request.respond('ok')['response']['functionResponse']
+
+
+def test_body_writer_truncates_at_limit():
+    body = BodyWriter(limit=10)
+    body.writelines(['12345', '67890', 'abc'])
+    assert body.truncated
+    assert body.getvalue() == '12345\n[Response truncated]'
+
+
+def test_dumps_round_trips():
+    payload = {'city': 'Zürich', 'periods': [1, 2]}
+    assert loads(dumps(payload)) == payload
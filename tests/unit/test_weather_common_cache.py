@@ -0,0 +1,30 @@
+from weather_common.cache import LRUCache, SQLiteStore, TieredCache
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+    assert lru.get('a') == 1
+    assert lru.get('b') is None
+    assert lru.get('c') == 3
+
+
+def test_lru_drops_expired_entries():
+    lru = LRUCache()
+    lru.set('a', 1, expires_at=100.0)
+    assert lru.get('a', now=99.0) == 1
+    assert lru.get('a', now=100.0) is None
+
+
+def test_tiered_cache_falls_back_to_durable_store(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'cache.db'))
+    TieredCache('points', store=store).set('47.61,-122.33', {'forecast': 'url'}, ttl=60)
+
+    # A fresh LRU (a new execution environment) is filled from the store
+    cache = TieredCache('points', store=store)
+    assert cache.get('47.61,-122.33') == {'forecast': 'url'}
+    assert len(cache.lru) == 1
+    assert cache.get('0,0') is None
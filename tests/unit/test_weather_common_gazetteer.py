@@ -0,0 +1,37 @@
+from weather_common.gazetteer import Gazetteer, build_index, normalize, parse_query, read_geonames
+
+GEONAMES = [
+    '5809844\tSeattle\tSeattle\t\t47.60621\t-122.33207\tP\tPPLA2\tUS\t\tWA\t033\t\t\t749256\t56\t57\tAmerica/Los_Angeles\t2024-01-01',
+    '5746545\tPortland\tPortland\t\t45.52345\t-122.67621\tP\tPPLA2\tUS\t\tOR\t051\t\t\t652503\t15\t50\tAmerica/Los_Angeles\t2024-01-01',
+    '4975802\tPortland\tPortland\t\t43.66147\t-70.25533\tP\tPPLA2\tUS\t\tME\t005\t\t\t68408\t9\t10\tAmerica/New_York\t2024-01-01',
+    '2657896\tZürich\tZurich\t\t47.36667\t8.55\tP\tPPLA\tCH\t\tZH\t112\t261\t\t341730\t\t429\tEurope/Zurich\t2024-01-01',
+]
+
+
+def make_gazetteer(tmp_path):
+    path = str(tmp_path / 'gazetteer.sqlite')
+    admin1 = {'US.WA': 'Washington', 'US.ME': 'Maine'}
+    build_index(read_geonames(GEONAMES, admin1), path)
+    return Gazetteer(path)
+
+
+def test_normalize_and_parse_query():
+    assert normalize('  São   PAULO ') == 'sao paulo'
+    assert parse_query('St. Louis, MO') == ('st louis', 'mo')
+
+
+def test_exact_lookup_prefers_largest_population(tmp_path):
+    gazetteer = make_gazetteer(tmp_path)
+    assert gazetteer.lookup('portland')['lat'] == '45.52345'
+    assert gazetteer.lookup('ZURICH')['display_name'] == 'Zürich, ZH, CH'
+
+
+def test_qualified_and_prefix_lookup(tmp_path):
+    gazetteer = make_gazetteer(tmp_path)
+    assert gazetteer.lookup('Portland, ME')['lat'] == '43.66147'
+    assert gazetteer.lookup('Portland, Maine')['lat'] == '43.66147'
+    assert gazetteer.lookup('Seat')['lon'] == '-122.33207'
+    assert gazetteer.lookup('Seat')['match'] == 'prefix'
+    assert gazetteer.lookup('Portland, ME')['match'] == 'exact'
+    assert gazetteer.lookup('Portland, TX') is None
+    assert gazetteer.lookup('Sea') is None
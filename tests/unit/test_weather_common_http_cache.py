@@ -0,0 +1,128 @@
+import json
+import time
+
+import pytest
+
+from weather_common.cache import TieredCache
+from weather_common.http_cache import ConditionalCache, UpstreamError, freshness_lifetime
+from weather_common.ratelimit import RateLimited, RateLimiter
+from weather_common.resilience import CircuitOpen, Deadline, DeadlineExceeded
+
+
+class FakeResponse:
+    def __init__(self, status, payload=None, headers=None):
+        self.status = status
+        self.data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.headers = headers or {}
+
+
+class FakeHttp:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, headers=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+
+def test_freshness_lifetime_from_headers():
+    assert freshness_lifetime({'Cache-Control': 'public, max-age=600'}) == 600
+    assert freshness_lifetime({'Cache-Control': 'max-age=600', 'Age': '100'}) == 500
+    assert freshness_lifetime({'Cache-Control': 'no-cache, max-age=600'}) == 0
+    assert freshness_lifetime({
+        'Date': 'Sun, 18 Oct 2026 12:00:00 GMT',
+        'Expires': 'Sun, 18 Oct 2026 12:05:00 GMT',
+    }) == 300
+    assert freshness_lifetime({}, default_ttl=30) == 30
+
+
+def test_fresh_entries_are_hits():
+    http = FakeHttp(FakeResponse(200, {'periods': [1]}, {'Cache-Control': 'max-age=600'}))
+    cache = ConditionalCache(TieredCache('forecast'))
+    assert cache.fetch(http, 'u', transform=lambda d: d['periods']) == [1]
+    assert cache.fetch(http, 'u', transform=lambda d: d['periods']) == [1]
+    assert cache.stats == {'hits': 1, 'misses': 1, 'revalidated': 0, 'refetched': 0, 'stale': 0}
+    assert 590 < cache.expires_at('u') - time.time() <= 600
+    assert cache.expires_at('other') is None
+
+
+def test_stale_entries_are_revalidated_with_etag():
+    http = FakeHttp(
+        FakeResponse(200, {'periods': [1]}, {'Cache-Control': 'max-age=0', 'ETag': '"v1"'}),
+        FakeResponse(304, headers={'Cache-Control': 'max-age=600'}),
+    )
+    cache = ConditionalCache(TieredCache('forecast'))
+    cache.fetch(http, 'u')
+    assert cache.fetch(http, 'u') == {'periods': [1]}
+    assert http.requests[1] == {'If-None-Match': '"v1"'}
+    assert cache.stats['revalidated'] == 1
+    # The 304 refreshed the entry's lifetime
+    assert cache.fetch(http, 'u') == {'periods': [1]}
+    assert cache.stats['hits'] == 1
+
+
+def test_rate_limited_requests_serve_stale_entries():
+    class RefusingLimiter:
+        def acquire(self, url, max_wait=None):
+            raise RateLimited('api.weather.gov', 1.0)
+
+    http = FakeHttp(FakeResponse(200, {'periods': [1]}, {'Cache-Control': 'max-age=0'}))
+    cache = ConditionalCache(TieredCache('forecast'))
+    cache.fetch(http, 'u')
+    cache.rate_limiter = RefusingLimiter()
+    assert cache.fetch(http, 'u') == {'periods': [1]}
+    assert cache.stats['stale'] == 1
+
+
+def test_rate_limit_waits_stay_within_the_deadline():
+    slept = []
+    limiter = RateLimiter({'api.weather.gov': (1.0, 1)}, max_wait=1.0, sleep=slept.append)
+    http = FakeHttp(FakeResponse(200, {'periods': [1]}, {'Cache-Control': 'max-age=0'}))
+    cache = ConditionalCache(TieredCache('forecast'), rate_limiter=limiter)
+    cache.fetch(http, 'https://api.weather.gov/a')
+    # The next slot is about a second away, more than this request has left
+    assert cache.fetch(http, 'https://api.weather.gov/a', deadline=Deadline(0.2)) == {'periods': [1]}
+    assert cache.stats['stale'] == 1
+    assert slept == []
+    assert limiter.stats['rejected'] == 1
+
+
+class FailingPolicy:
+    def __init__(self, error=None, status=None):
+        self.error = error
+        self.status = status
+
+    def get(self, http, url, headers=None, deadline=None):
+        if self.error is not None:
+            raise self.error
+        return FakeResponse(self.status)
+
+
+def test_unavailable_upstream_serves_stale_entries_with_their_age():
+    http = FakeHttp(FakeResponse(200, {'periods': [1]}, {'Cache-Control': 'max-age=0'}))
+    cache = ConditionalCache(TieredCache('forecast'))
+    assert cache.fetch_with_age(http, 'u') == ({'periods': [1]}, None)
+
+    for policy in (FailingPolicy(DeadlineExceeded('u')), FailingPolicy(CircuitOpen('h', 30)),
+                   FailingPolicy(status=503)):
+        cache.policy = policy
+        payload, age = cache.fetch_with_age(http, 'u')
+        assert payload == {'periods': [1]}
+        assert 0 <= age < 5
+    assert cache.stats['stale'] == 3
+
+
+def test_unusable_answers_and_empty_cache_still_raise():
+    http = FakeHttp(FakeResponse(200, {'periods': [1]}, {'Cache-Control': 'max-age=0'}))
+    cache = ConditionalCache(TieredCache('forecast'), policy=FailingPolicy(status=404))
+    with pytest.raises(UpstreamError):
+        cache.fetch(http, 'other')
+    cache.policy = None
+    cache.fetch(http, 'u')
+    cache.policy = FailingPolicy(status=404)
+    with pytest.raises(UpstreamError):
+        cache.fetch(http, 'u')
+    cache.policy = FailingPolicy(DeadlineExceeded('other'))
+    with pytest.raises(DeadlineExceeded):
+        cache.fetch(http, 'other')
@@ -0,0 +1,34 @@
+import json
+
+from weather_common import metrics
+
+
+def test_timings_accumulate_per_stage():
+    timings = metrics.Timings()
+    with timings.measure('forecast'):
+        pass
+    with timings.measure('forecast'):
+        pass
+    assert list(timings.ms) == ['forecast']
+    assert timings.ms['forecast'] >= 0
+
+
+def test_emf_record_declares_each_stage_as_a_metric():
+    record = metrics.emf_record('get_weather', {'points': 1.5, 'forecast': 80.0},
+                                {'rate_limiter': {'waited': 0}}, namespace='Test', timestamp=1760800000)
+
+    assert record['_aws'] == {
+        'Timestamp': 1760800000000,
+        'CloudWatchMetrics': [{
+            'Namespace': 'Test',
+            'Dimensions': [['Function']],
+            'Metrics': [{'Name': 'points', 'Unit': 'Milliseconds'}, {'Name': 'forecast', 'Unit': 'Milliseconds'}],
+        }],
+    }
+    assert (record['Function'], record['points'], record['rate_limiter']) == ('get_weather', 1.5, {'waited': 0})
+
+
+def test_emit_prints_one_json_line(capsys):
+    metrics.emit('geocode_city', {'geocode': 2.0})
+    line, = capsys.readouterr().out.splitlines()
+    assert json.loads(line)['geocode'] == 2.0
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from weather_common import noaa
+from weather_common.resilience import DeadlineExceeded
+
+GRIDPOINT = {'gridId': 'SEW', 'gridX': 124, 'gridY': 67, 'forecast': 'f', 'forecastHourly': 'h'}
+
+PERIOD = {
+    'number': 1,
+    'name': 'Tonight',
+    'startTime': '2026-10-18T18:00:00-07:00',
+    'endTime': '2026-10-19T06:00:00-07:00',
+    'temperature': 48,
+    'temperatureUnit': 'F',
+    'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': None},
+    'windSpeed': '5 mph',
+    'windDirection': 'SW',
+    'shortForecast': 'Mostly Cloudy',
+    'detailedForecast': 'Mostly cloudy, with a low around 48.',
+}
+
+
+def test_compact_period_keeps_typed_fields_and_drops_empty_ones():
+    assert noaa.compact_period(PERIOD) == {
+        'name': 'Tonight',
+        'start': '2026-10-18T18:00:00-07:00',
+        'end': '2026-10-19T06:00:00-07:00',
+        'temp': 48,
+        'unit': 'F',
+        'wind': '5 mph SW',
+        'short': 'Mostly Cloudy',
+    }
+
+
+def test_upcoming_skips_periods_that_already_ended():
+    periods = [{'end': '2026-10-18T12:00:00+00:00'}, {'end': '2026-10-18T18:00:00+00:00'},
+               {'end': '2026-10-19T00:00:00+00:00'}, {'end': '2026-10-19T06:00:00+00:00'}]
+    now = datetime(2026, 10, 18, 13, tzinfo=timezone.utc)
+    assert noaa.upcoming(periods, 2, now) == periods[1:3]
+
+
+def test_build_forecast_includes_hourly_when_available(monkeypatch):
+    monkeypatch.setattr(noaa, 'resolve_gridpoint', lambda lat, lon, deadline=None: GRIDPOINT)
+    monkeypatch.setattr(noaa, 'get_forecast_periods', lambda gridpoint, deadline=None: ([{'name': 'Today', 'temp': 64}], None))
+    monkeypatch.setattr(noaa, 'get_hourly_periods', lambda gridpoint, deadline=None: ([{'temp': 61}], None))
+
+    forecast = noaa.build_forecast('47.6', '-122.3', 'Seattle')
+
+    assert set(forecast.pop('timings')) == {'points', 'forecast', 'hourly'}
+    assert forecast == {
+        'schema_version': noaa.SCHEMA_VERSION,
+        'location': {'city': 'Seattle', 'latitude': '47.6', 'longitude': '-122.3'},
+        'periods': [{'name': 'Today', 'temp': 64}],
+        'hourly': [{'temp': 61}],
+    }
+    assert 'hourly' not in noaa.build_forecast('47.6', '-122.3', hourly=False)
+
+
+def test_build_forecast_marks_stale_forecasts_with_their_age(monkeypatch):
+    def timed_out(gridpoint, deadline=None):
+        raise DeadlineExceeded('h')
+
+    monkeypatch.setattr(noaa, 'resolve_gridpoint', lambda lat, lon, deadline=None: GRIDPOINT)
+    monkeypatch.setattr(noaa, 'get_forecast_periods', lambda gridpoint, deadline=None: ([{'temp': 64}], 5400.4))
+    monkeypatch.setattr(noaa, 'get_hourly_periods', timed_out)
+
+    forecast = noaa.build_forecast('47.6', '-122.3', 'Seattle')
+
+    # Without hourly data the daily forecast still answers
+    assert 'hourly' not in forecast
+    assert forecast['periods'] == [{'temp': 64}]
+    assert forecast['stale']['age_seconds'] == 5400
+
+
+def test_build_forecast_without_cached_data_is_unavailable(monkeypatch):
+    def timed_out(gridpoint, deadline=None):
+        raise DeadlineExceeded('f')
+
+    monkeypatch.setattr(noaa, 'resolve_gridpoint', lambda lat, lon, deadline=None: GRIDPOINT)
+    monkeypatch.setattr(noaa, 'get_forecast_periods', timed_out)
+
+    with pytest.raises(noaa.ForecastUnavailable) as raised:
+        noaa.build_forecast('47.6', '-122.3', 'Seattle')
+    assert 'not responding' in str(raised.value)
+    assert raised.value.reason == 'f did not answer in time'
@@ -0,0 +1,39 @@
+import pytest
+
+from weather_common.ratelimit import RateLimited, RateLimiter, parse_limits
+
+
+def make_limiter(max_wait):
+    sleeps = []
+    limiter = RateLimiter({'api.weather.gov': (1.0, 2)}, max_wait=max_wait, sleep=sleeps.append)
+    return limiter, sleeps
+
+
+def test_burst_then_reject_when_wait_exceeds_budget():
+    limiter, sleeps = make_limiter(max_wait=0.5)
+    assert limiter.acquire('https://api.weather.gov/points/1,2') == 0.0
+    assert limiter.acquire('https://api.weather.gov/points/1,2') == 0.0
+    with pytest.raises(RateLimited):
+        limiter.acquire('https://api.weather.gov/points/1,2')
+    assert sleeps == []
+    assert limiter.stats['rejected'] == 1
+
+
+def test_queues_briefly_within_budget():
+    limiter, sleeps = make_limiter(max_wait=2.0)
+    for _ in range(3):
+        limiter.acquire('https://api.weather.gov/points/1,2')
+    assert len(sleeps) == 1 and 0.9 < sleeps[0] <= 1.0
+    assert limiter.stats['waited'] == 1
+
+
+def test_unlisted_hosts_are_not_limited():
+    limiter, _ = make_limiter(max_wait=0.0)
+    for _ in range(10):
+        assert limiter.acquire('http://localhost:8080/x') == 0.0
+
+
+def test_parse_limits():
+    assert parse_limits('api.weather.gov=5:10, example.com=0.5') == {
+        'api.weather.gov': (5.0, 10), 'example.com': (0.5, 1),
+    }
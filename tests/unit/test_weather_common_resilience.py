@@ -0,0 +1,178 @@
+import threading
+import time
+
+import pytest
+import urllib3
+
+from weather_common.ratelimit import RateLimiter
+from weather_common.resilience import (
+    CircuitBreaker, CircuitBreakers, CircuitOpen, Deadline, DeadlineExceeded, RequestPolicy, request_deadline,
+)
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class FakeHttp:
+    """Attempt i sleeps delays[i] seconds and then answers outcomes[i]."""
+
+    def __init__(self, *attempts):
+        self.attempts = list(attempts)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, timeout=None, retries=None):
+        with self._lock:
+            self.calls.append(timeout)
+            delay, outcome = self.attempts.pop(0)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_request_deadline_stays_within_the_lambda_timeout():
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 1000
+
+    assert 0.6 < request_deadline(Context(), budget=5.0).remaining() <= 0.7
+    assert 1.9 < request_deadline(budget=2.0).remaining() <= 2.0
+
+
+def test_breaker_opens_on_failure_rate_then_tries_once():
+    clock = Clock()
+    breaker = CircuitBreaker('api.weather.gov', failure_rate=0.5, window=4, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_success()
+    breaker.allow()
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.allow()
+    assert raised.value.retry_after == 30
+
+    clock.now += 30
+    breaker.allow()  # the trial request
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 30
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats == {'opened': 2, 'rejected': 2}
+
+
+def test_breakers_are_per_host():
+    breakers = CircuitBreakers(window=2)
+    breakers.for_url('https://api.weather.gov/points/1,2').record_failure()
+    assert breakers.for_url('https://api.weather.gov/gridpoints/x').state == CircuitBreaker.OPEN
+    assert breakers.for_url('https://nominatim.openstreetmap.org/search').state == CircuitBreaker.CLOSED
+
+
+def test_slow_attempts_are_hedged():
+    http = FakeHttp((0.5, 200), (0.0, 204))
+    policy = RequestPolicy(hedge_after=0.05, attempts=2)
+
+    start = time.monotonic()
+    assert policy.get(http, 'https://api.weather.gov/f').status == 204
+    assert time.monotonic() - start < 0.4
+    assert policy.stats == {'requests': 1, 'hedged': 1, 'retried': 0, 'timeouts': 0, 'rate_limited': 0}
+
+
+def test_failed_attempts_are_retried_and_last_answer_returned():
+    breakers = CircuitBreakers(window=2)
+    http = FakeHttp((0.0, 503), (0.0, urllib3.exceptions.ProtocolError('reset')), (0.0, 200))
+    policy = RequestPolicy(breakers, attempts=3)
+    assert policy.get(http, 'https://api.weather.gov/f').status == 200
+    assert policy.stats['retried'] == 2
+    # Failed attempts of a request that succeeded do not count against the host
+    assert breakers.for_url('https://api.weather.gov/f').state == CircuitBreaker.CLOSED
+
+    http = FakeHttp((0.0, 503), (0.0, 502))
+    policy = RequestPolicy(breakers, attempts=2)
+    assert policy.get(http, 'https://api.weather.gov/f').status == 502
+    assert breakers.for_url('https://api.weather.gov/f').state == CircuitBreaker.OPEN
+
+
+def test_deadline_caps_timeouts_and_waiting():
+    http = FakeHttp((0.5, 200))
+    breakers = CircuitBreakers(window=2)
+    policy = RequestPolicy(breakers, attempts=1, read_timeout=5.0)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        policy.get(http, 'https://api.weather.gov/f', deadline=Deadline(0.1))
+    assert time.monotonic() - start < 0.3
+    assert http.calls[0].read_timeout <= 0.1
+    # The timeout counts as a failure, and the breaker now fails fast
+    with pytest.raises(CircuitOpen):
+        policy.get(http, 'https://api.weather.gov/f')
+    with pytest.raises(DeadlineExceeded):
+        policy.get(http, 'https://api.weather.gov/f', deadline=Deadline(0))
+
+
+def test_trial_that_runs_out_of_time_reopens_the_breaker():
+    clock = Clock()
+    breakers = CircuitBreakers(window=2, reset_timeout=30, clock=clock)
+    breaker = breakers.for_url('https://api.weather.gov/f')
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 30
+    policy = RequestPolicy(breakers, hedge_after=0.75, attempts=3)
+    with pytest.raises(DeadlineExceeded):
+        policy.get(FakeHttp((0.5, 200)), 'https://api.weather.gov/f', deadline=Deadline(0.05))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # After the next reset timeout another trial goes out, and closes it
+    clock.now += 30
+    assert policy.get(FakeHttp((0.0, 200)), 'https://api.weather.gov/f').status == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_429_is_not_retried():
+    http = FakeHttp((0.0, 429), (0.0, 200))
+    policy = RequestPolicy(attempts=3)
+    assert policy.get(http, 'https://api.weather.gov/f').status == 429
+    assert len(http.calls) == 1
+
+
+def test_retries_back_off_within_the_deadline():
+    http = FakeHttp((0.0, 503), (0.0, 200))
+    policy = RequestPolicy(attempts=2, backoff=10.0)
+    policy._backoff = lambda failures: 0.5
+    # The backoff would run past the deadline, so the 503 is the answer
+    assert policy.get(http, 'https://api.weather.gov/f', deadline=Deadline(0.2)).status == 503
+    assert len(http.calls) == 1
+
+    policy._backoff = lambda failures: 0.05
+    http = FakeHttp((0.0, 503), (0.0, 200))
+    start = time.monotonic()
+    assert policy.get(http, 'https://api.weather.gov/f', deadline=Deadline(1.0)).status == 200
+    assert time.monotonic() - start >= 0.05
+
+
+def test_extra_attempts_take_rate_limit_tokens():
+    limiter = RateLimiter({'api.weather.gov': (1.0, 2)})
+    limiter.acquire('https://api.weather.gov/f')  # the caller's token for the first attempt
+    http = FakeHttp((0.0, 503), (0.0, 503), (0.0, 200))
+    policy = RequestPolicy(attempts=3, backoff=0.0, rate_limiter=limiter)
+    assert policy.get(http, 'https://api.weather.gov/f').status == 503
+    # One token was left for a retry; the next would have had to wait
+    assert len(http.calls) == 2
+    assert policy.stats['rate_limited'] == 1
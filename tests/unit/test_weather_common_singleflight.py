@@ -0,0 +1,54 @@
+import threading
+import time
+
+from weather_common.cache import SQLiteStore, TieredCache
+from weather_common.resilience import Deadline
+from weather_common.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_request():
+    calls = []
+    flight = SingleFlight()
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return {'found': True}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('seattle', fetch)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'found': True}] * 8
+    assert flight.stats['coalesced'] == 7
+
+
+def test_waits_for_result_from_lease_holder(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'cache.db'))
+    leader_cache = TieredCache('geocode', store=store)
+    follower_cache = TieredCache('geocode', store=store)
+    assert leader_cache.acquire_lease('seattle', ttl=10)
+
+    def finish_leader():
+        time.sleep(0.05)
+        leader_cache.set('seattle', {'found': False}, ttl=60)
+
+    threading.Thread(target=finish_leader).start()
+    flight = SingleFlight(follower_cache, wait=2.0, poll_interval=0.01)
+    assert flight.do('seattle', lambda: {'found': 'refetched'}) == {'found': False}
+    assert flight.stats['remote_waits'] == 1
+
+
+def test_wait_for_lease_holder_stops_at_the_deadline(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'cache.db'))
+    assert TieredCache('geocode', store=store).acquire_lease('seattle', ttl=10)
+    flight = SingleFlight(TieredCache('geocode', store=store), wait=3.0, poll_interval=0.01)
+
+    start = time.monotonic()
+    assert flight.do('seattle', lambda: {'found': 'refetched'}, Deadline(0.1)) == {'found': 'refetched'}
+    assert time.monotonic() - start < 0.5